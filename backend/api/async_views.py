@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_THREADS or 1,
+    thread_name_prefix='async-read',
+)
+
+
+def run_read_view(view, request, *args, **kwargs):
+    """
+    Выполняет view в потоке пула и сразу рендерит ответ, чтобы
+    сериализация не уходила в общий поток синхронного кода.
+    Соединения с БД потока закрываются по тем же правилам,
+    что и в конце обычного запроса.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read(view):
+    """
+    Асинхронная обёртка над синхронным view. Чтение выполняется
+    в пуле из ASYNC_READ_THREADS потоков параллельно, запись остаётся
+    в общем потоке синхронного кода, как у обычных view под ASGI.
+    Если ASYNC_READ_THREADS сброшен в 0 после загрузки маршрутов,
+    чтение тоже идёт в общем потоке: так работают тесты, которые
+    видят данные только в своём соединении.
+    """
+    read = sync_to_async(
+        run_read_view, thread_sensitive=False, executor=executor,
+    )
+    write = sync_to_async(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS and settings.ASYNC_READ_THREADS:
+            return await read(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_read_urls(urls, names):
+    """
+    Оборачивает в async_read маршруты с именами из names. При
+    ASYNC_READ_THREADS = 0 маршруты не меняются: под WSGI обёртка
+    только добавляет переключение потоков и соединения с БД.
+    """
+    if not settings.ASYNC_READ_THREADS:
+        return urls
+    return [
+        URLPattern(
+            url.pattern, async_read(url.callback), url.default_args, url.name,
+        ) if url.name in names else url
+        for url in urls
+    ]
@@ -0,0 +1,47 @@
+from bisect import bisect_left, insort
+
+from api.indexes import VersionedIndex
+from recipes.models import Ingredient
+
+
+class IngredientIndex(VersionedIndex):
+    """
+    Индекс названий ингредиентов в памяти процесса для автодополнения.
+    Хранит отсортированный список (название в нижнем регистре, id),
+    поиск по префиксу выполняется через bisect, точное совпадение
+    оказывается первым.
+    """
+    name = 'ingredient'
+
+    @staticmethod
+    def make_key(ingredient):
+        return ingredient.name.casefold(), ingredient.id
+
+    def build(self):
+        ingredients = {
+            ingredient.id: ingredient
+            for ingredient in Ingredient.objects.all()
+        }
+        return sorted(map(self.make_key, ingredients.values())), ingredients
+
+    def apply(self, state, ids):
+        keys, ingredients = state[0].copy(), state[1].copy()
+        for id in ids:
+            old = ingredients.pop(id, None)
+            if old is not None:
+                del keys[bisect_left(keys, self.make_key(old))]
+        for ingredient in Ingredient.objects.filter(id__in=ids):
+            ingredients[ingredient.id] = ingredient
+            insort(keys, self.make_key(ingredient))
+        return keys, ingredients
+
+    def search(self, prefix):
+        """Ингредиенты, название которых начинается с prefix."""
+        keys, ingredients = self.get_state()
+        prefix = prefix.casefold()
+        start = bisect_left(keys, (prefix,))
+        end = bisect_left(keys, (prefix + chr(0x10ffff),), start)
+        return [ingredients[id] for _, id in keys[start:end]]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,225 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.dispatch import Signal
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from api.constans import (
+    CACHE_LOCK_TIMEOUT, CACHE_LOCK_WAIT, CACHE_LOCK_WAIT_STEP, CHANGES_LIMIT,
+    CHANGES_TIMEOUT, RECIPE_CACHE_TIMEOUT, RECIPE_FRAGMENT_TIMEOUT,
+    REFERENCE_CACHE_TIMEOUT,
+)
+
+VERSION_KEY = 'version:{}'
+CHANGES_KEY = 'changes:{}:{}'
+FRAGMENT_KEY = 'fragment:{}:{}:{}:{}'
+
+# Отправляется после чтения фрагментов с числом попаданий и промахов,
+# к нему подключаются счётчики метрик.
+fragment_cache_used = Signal()
+
+
+def get_version(name):
+    """Текущая версия данных с именем name для ключей кеша."""
+    version = cache.get(VERSION_KEY.format(name))
+    if version is None:
+        version = time.time_ns()
+        cache.add(VERSION_KEY.format(name), version, timeout=None)
+        version = cache.get(VERSION_KEY.format(name), version)
+    return version
+
+
+def bump_version(*names):
+    """Инвалидирует кеш: все ключи со старой версией больше не читаются."""
+    for name in names:
+        try:
+            cache.incr(VERSION_KEY.format(name))
+        except ValueError:
+            cache.set(VERSION_KEY.format(name), time.time_ns(), timeout=None)
+
+
+def publish_changes(name, ids):
+    """
+    Меняет версию данных name, как bump_version, и сохраняет под новой
+    версией id изменённых объектов: по ним индексы в памяти других
+    процессов догоняют версию без полной перестройки.
+    """
+    try:
+        version = cache.incr(VERSION_KEY.format(name))
+    except ValueError:
+        bump_version(name)
+        return
+    cache.set(
+        CHANGES_KEY.format(name, version), list(ids),
+        timeout=CHANGES_TIMEOUT,
+    )
+
+
+def get_changes(name, old_version, new_version):
+    """
+    id объектов, изменённых после old_version до new_version включительно,
+    или None, если изменения какой-то из версий неизвестны.
+    """
+    if (
+        old_version is None
+        or not 0 < new_version - old_version <= CHANGES_LIMIT
+    ):
+        return None
+    keys = [
+        CHANGES_KEY.format(name, version)
+        for version in range(old_version + 1, new_version + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return set().union(*changes.values())
+
+
+def get_request_key(request, *names):
+    """
+    Ключ кеша для запроса с учётом хоста, пути, параметров
+    и версий данных.
+    """
+    params = urlencode(sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    ))
+    versions = ':'.join(f'{name}.{get_version(name)}' for name in names)
+    digest = hashlib.md5(
+        f'{request.get_host()}{request.path}?{params}'.encode()
+    ).hexdigest()
+    return f'response:{versions}:{digest}'
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    Значение из кеша или результат compute(). Пересчитывает значение
+    только тот, кто взял блокировку ключа, остальные недолго ждут его
+    результата и лишь потом считают сами: при инвалидации популярной
+    страницы в БД не идут все воркеры разом.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock = f'{key}:lock'
+    if not cache.add(lock, 1, timeout=CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_WAIT_STEP)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        lock = None
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout=timeout)
+    finally:
+        if lock is not None:
+            cache.delete(lock)
+    return value
+
+
+def get_fragments(name, objects, render, request=None):
+    """
+    Сериализованные фрагменты объектов по ключу из id и даты изменения.
+    Отсутствующие в кеше фрагменты рендерятся одним вызовом
+    render(objects) и сохраняются. Возвращает словарь {pk: фрагмент}.
+    """
+    host = request.get_host() if request is not None else ''
+    keys = {
+        obj.pk: FRAGMENT_KEY.format(
+            name, obj.pk, int(obj.updated_at.timestamp() * 10 ** 6), host,
+        )
+        for obj in objects
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {
+        pk: cached[key] for pk, key in keys.items() if key in cached
+    }
+    missed = [obj for obj in objects if obj.pk not in fragments]
+    if missed:
+        rendered = dict(zip((obj.pk for obj in missed), render(missed)))
+        cache.set_many(
+            {keys[pk]: fragment for pk, fragment in rendered.items()},
+            timeout=RECIPE_FRAGMENT_TIMEOUT,
+        )
+        fragments.update(rendered)
+    fragment_cache_used.send(
+        sender=name, hits=len(objects) - len(missed), misses=len(missed),
+    )
+    return fragments
+
+
+class ReferenceCacheMixin:
+    """
+    Кеширует ответы справочных эндпоинтов и отдаёт сильный ETag.
+    Условный GET с совпадающим If-None-Match получает 304 без запроса к БД.
+    """
+    cache_names = ()
+    cache_timeout = REFERENCE_CACHE_TIMEOUT
+
+    def get_cache_names(self, request):
+        return self.cache_names
+
+    def use_cache(self, request):
+        return True
+
+    def cached_response(self, request, method, *args, **kwargs):
+        if not self.use_cache(request):
+            return method(request, *args, **kwargs)
+        response = None
+
+        def compute():
+            nonlocal response
+            response = method(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return None
+            content = JSONRenderer().render(response.data)
+            etag = f'"{hashlib.sha256(content).hexdigest()}"'
+            return etag, response.data
+
+        cached = get_or_compute(
+            get_request_key(request, *self.get_cache_names(request)),
+            compute,
+            self.cache_timeout,
+        )
+        if cached is None:
+            return response
+        etag, data = cached
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+        return Response(data, headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousCacheMixin(ReferenceCacheMixin):
+    """
+    Кеширует ответы рецептов для анонимных пользователей: у них флаги
+    избранного, корзины и подписки всегда False, ответы одинаковы.
+    Сортировка по популярности дополнительно зависит от версии избранного.
+    """
+    cache_names = ('recipe', 'tag', 'ingredient', 'author')
+    cache_timeout = RECIPE_CACHE_TIMEOUT
+
+    def get_cache_names(self, request):
+        if 'favorites_count' in request.query_params.get('ordering', ''):
+            return self.cache_names + ('favorite',)
+        return self.cache_names
+
+    def use_cache(self, request):
+        return request.user.is_anonymous
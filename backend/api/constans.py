@@ -1 +1,21 @@
 MIN_VALUE = 1
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+RECIPE_CACHE_TIMEOUT = 60 * 60
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2
+CACHE_LOCK_WAIT_STEP = 0.05
+# Сколько хранятся id объектов, изменённых в версии данных, и на сколько
+# версий индекс в памяти может отстать, чтобы догнать их без перестройки.
+CHANGES_TIMEOUT = 60 * 60
+CHANGES_LIMIT = 100
+
+FEED_AUTHOR_LENGTH = 100
+FEED_LENGTH = 500
+FEED_TIMEOUT = 60 * 60
+FEED_AUTHORS_CHUNK = 500
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
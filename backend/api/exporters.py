@@ -0,0 +1,94 @@
+import csv
+import json
+
+SHOPPING_CART_COLUMNS = (
+    ('name', 'name', 'Ингредиент'),
+    ('measurement_unit', 'measurement_unit', 'ед.изм.'),
+    ('amount', 'amount', 'количество'),
+)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class BaseExporter:
+    """
+    Потоковая выгрузка списка покупок.
+    Строки приходят кортежами в порядке колонок columns,
+    каждый формат выводит их по self.keys или self.titles.
+    """
+    format = None
+    content_type = None
+
+    def __init__(self, columns=SHOPPING_CART_COLUMNS):
+        self.keys = [key for _, key, _ in columns]
+        self.titles = [title for _, _, title in columns]
+
+    def begin(self):
+        return ''
+
+    def row(self, row):
+        raise NotImplementedError
+
+    def end(self):
+        return ''
+
+    def stream(self, rows):
+        yield self.begin()
+        for row in rows:
+            yield self.row(row)
+        yield self.end()
+
+
+class CSVExporter(BaseExporter):
+    format = 'csv'
+    content_type = 'text/csv'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = csv.writer(Echo())
+
+    def begin(self):
+        return '\ufeff' + self.writer.writerow(self.titles)
+
+    def row(self, row):
+        return self.writer.writerow(row)
+
+
+class TextExporter(BaseExporter):
+    format = 'txt'
+    content_type = 'text/plain'
+
+    def row(self, row):
+        return ', '.join(
+            f'{title}: {value}' for title, value in zip(self.titles, row)
+        ) + '\n'
+
+
+class JSONExporter(BaseExporter):
+    format = 'json'
+    content_type = 'application/json'
+
+    def begin(self):
+        self.separator = '['
+        return ''
+
+    def row(self, row):
+        value = self.separator + json.dumps(
+            dict(zip(self.keys, row)), ensure_ascii=False
+        )
+        self.separator = ','
+        return value
+
+    def end(self):
+        return '[]' if self.separator == '[' else ']'
+
+
+EXPORTERS = {
+    exporter.format: exporter
+    for exporter in (CSVExporter, TextExporter, JSONExporter)
+}
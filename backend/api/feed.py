@@ -0,0 +1,146 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from heapq import merge
+from itertools import islice, takewhile
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from api.constans import (
+    FEED_AUTHOR_LENGTH, FEED_AUTHORS_CHUNK, FEED_LENGTH, FEED_TIMEOUT,
+)
+from api.pagination import KeysetPagination
+from recipes.models import Follow, Recipe
+
+AUTHOR_KEY = 'feed:author:{}'
+USER_KEY = 'feed:user:{}'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def feed_key(pub_date, id):
+    """
+    Ключ рецепта в ленте: по возрастанию ключей рецепты идут
+    от новых к старым, как при сортировке ('-pub_date', '-id').
+    """
+    return -((pub_date - EPOCH) // timedelta(microseconds=1)), -id
+
+
+def get_author_timelines(author_ids):
+    """
+    Последние рецепты каждого автора: {id автора: (ключи, обрезан ли)}.
+    Отсутствующие в кеше авторы загружаются пачками ограниченного размера.
+    """
+    cached = cache.get_many([AUTHOR_KEY.format(id) for id in author_ids])
+    timelines = {}
+    missing = []
+    for id in author_ids:
+        timeline = cached.get(AUTHOR_KEY.format(id))
+        if timeline is None:
+            missing.append(id)
+        else:
+            timelines[id] = timeline
+    for start in range(0, len(missing), FEED_AUTHORS_CHUNK):
+        chunk = missing[start:start + FEED_AUTHORS_CHUNK]
+        keys = {id: [] for id in chunk}
+        rows = Recipe.objects.filter(
+            author_id__in=chunk,
+            pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('pk')[
+                    :FEED_AUTHOR_LENGTH + 1
+                ]
+            ),
+        ).values_list('author_id', 'pub_date', 'id')
+        for author_id, pub_date, id in rows:
+            keys[author_id].append(feed_key(pub_date, id))
+        loaded = {}
+        for author_id, author_keys in keys.items():
+            author_keys.sort()
+            loaded[author_id] = (
+                author_keys[:FEED_AUTHOR_LENGTH],
+                len(author_keys) > FEED_AUTHOR_LENGTH,
+            )
+        cache.set_many(
+            {AUTHOR_KEY.format(id): value for id, value in loaded.items()},
+            timeout=FEED_TIMEOUT,
+        )
+        timelines.update(loaded)
+    return timelines
+
+
+def get_timeline(user):
+    """
+    Лента пользователя: (ключи рецептов, полная ли лента).
+    Собирается слиянием списков авторов через кучу и хранится в кеше.
+    Ключи после последнего рецепта обрезанных списков отбрасываются,
+    так как между ними могут быть пропущенные рецепты.
+    """
+    key = USER_KEY.format(user.id)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    author_ids = list(
+        Follow.objects.filter(user=user).order_by().values_list(
+            'author_id', flat=True
+        )
+    )
+    timelines = get_author_timelines(author_ids).values()
+    horizons = [keys[-1] for keys, truncated in timelines if truncated]
+    horizon = min(horizons) if horizons else None
+    timeline = list(islice(
+        takewhile(
+            lambda entry: horizon is None or entry <= horizon,
+            merge(*(keys for keys, _ in timelines)),
+        ),
+        FEED_LENGTH + 1,
+    ))
+    complete = horizon is None and len(timeline) <= FEED_LENGTH
+    cached = (timeline[:FEED_LENGTH], complete)
+    cache.set(key, cached, timeout=FEED_TIMEOUT)
+    return cached
+
+
+def invalidate_author(author_id):
+    """Сбрасывает ленты автора и всех его подписчиков."""
+    cache.delete(AUTHOR_KEY.format(author_id))
+    cache.delete_many([
+        USER_KEY.format(user_id)
+        for user_id in Follow.objects.filter(
+            author_id=author_id
+        ).order_by().values_list('user_id', flat=True)
+    ])
+
+
+def invalidate_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Пагинация ленты подписок по курсору. Страницы берутся из ленты в кеше,
+    к базе идёт только запрос рецептов страницы по первичным ключам.
+    За пределами ленты в кеше страница выбирается из базы по ключу.
+    """
+
+    def __init__(self):
+        super().__init__(('-pub_date', '-id'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        timeline, complete = get_timeline(request.user)
+        start = 0
+        if cursor:
+            start = bisect_right(
+                timeline,
+                feed_key(*self.decode_cursor(cursor, queryset.model)),
+            )
+        keys = timeline[start:start + self.page_size + 1]
+        if len(keys) <= self.page_size and not complete:
+            return super().paginate_queryset(queryset, request, view)
+        recipes = queryset.in_bulk([-id for _, id in keys])
+        page = [recipes[-id] for _, id in keys if -id in recipes]
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
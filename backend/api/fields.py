@@ -0,0 +1,64 @@
+import hashlib
+
+from django.core.files.base import ContentFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from recipes.constans import MAX_IMAGE_SIZE, RENDITION_WIDTHS
+from recipes.images import rendition_name, strip_metadata
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение в base64 с ограничением размера. Размер проверяется
+    до декодирования, имя файла — хеш содержимого, поэтому повторная
+    загрузка того же изображения не создаёт новый файл. Оригинал
+    сохраняется без метаданных.
+    """
+    default_error_messages = {
+        'too_large': (
+            f'Размер изображения не должен превышать '
+            f'{MAX_IMAGE_SIZE // (1024 * 1024)} МБ.'
+        ),
+    }
+
+    def to_internal_value(self, base64_data):
+        if (
+            isinstance(base64_data, str)
+            and len(base64_data.split(';base64,')[-1]) * 3 // 4
+            > MAX_IMAGE_SIZE
+        ):
+            self.fail('too_large')
+        file = super().to_internal_value(base64_data)
+        if file is None:
+            return file
+        model_field = self.parent.Meta.model._meta.get_field(self.source)
+        name = model_field.generate_filename(None, file.name)
+        if model_field.storage.exists(name):
+            return name
+        file.seek(0)
+        return ContentFile(strip_metadata(file.read()), name=file.name)
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()[:32]
+
+
+class RenditionsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def __init__(self, renditions=tuple(RENDITION_WIDTHS), **kwargs):
+        self.renditions = renditions
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for rendition in self.renditions:
+            url = value.storage.url(rendition_name(value.name, rendition))
+            urls[rendition] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return urls
@@ -1,6 +1,30 @@
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Ingredient, Recipe
+from api.cache import get_version
+from api.constans import REFERENCE_CACHE_TIMEOUT
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+TAG_MAP_KEY = 'tag-map:{}'
+TAGS_ANY = 'any'
+TAGS_ALL = 'all'
+
+
+def get_tag_ids():
+    """Словарь {slug: id} всех тегов из кеша текущей версии тегов."""
+    key = TAG_MAP_KEY.format(get_version('tag'))
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, timeout=REFERENCE_CACHE_TIMEOUT)
+    return tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class IngredientFilter(filters.FilterSet):
@@ -13,16 +37,55 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтр рецептов в избранном и списке покупок."""
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    """
+    Фильтр рецептов в избранном и списке покупок.
+    Теги по умолчанию объединяются по «или», tags_match=all оставляет
+    рецепты со всеми указанными тегами.
+    """
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags',
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_ANY, TAGS_ANY), (TAGS_ALL, TAGS_ALL)),
+        method='get_tags_match',
+    )
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'tags_match', 'author', 'is_favorited',
+            'is_in_shopping_cart', 'search',
+        )
+
+    def get_tags(self, queryset, name, value):
+        """
+        Slug переводятся в id по кешу, рецепты отбираются подзапросом
+        EXISTS по таблице связи без соединения и дублей строк.
+        """
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids()
+        ids = {tag_ids[slug] for slug in value if slug in tag_ids}
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk')
+        )
+        if self.form.cleaned_data.get('tags_match') == TAGS_ALL:
+            for id in ids:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=id))
+                )
+            return queryset
+        return queryset.filter(Exists(recipe_tags.filter(tag_id__in=ids)))
+
+    def get_tags_match(self, queryset, name, value):
+        """Учитывается в get_tags."""
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         if value:
@@ -33,3 +96,30 @@ class RecipeFilter(filters.FilterSet):
         if value:
             return queryset.filter(shopping_recipe__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию и ингредиентам."""
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка рецептов с однозначным порядком: после полей из запроса
+    добавляются pub_date и id в направлении последнего поля, как в индексе
+    recipe_popular_idx. Без них рецепты с равным счётчиком переходят
+    между страницами.
+    """
+    tie_breakers = ('pub_date', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        prefix = '-' if ordering[-1].startswith('-') else ''
+        names = {field.lstrip('-') for field in ordering}
+        return [*ordering, *(
+            f'{prefix}{name}' for name in self.tie_breakers
+            if name not in names
+        )]
@@ -0,0 +1,41 @@
+from threading import Lock
+
+from api.cache import get_changes, get_version
+
+
+class VersionedIndex:
+    """
+    Индекс в памяти процесса, который следует за версией данных name
+    в кеше. Состояние индекса не изменяется на месте, а заменяется
+    новым, поэтому читатели используют его без блокировки.
+    При смене версии индекс перечитывает из БД объекты, изменённые
+    в пропущенных версиях (publish_changes), и перестраивается целиком,
+    только если изменения какой-то версии в кеше не найдены.
+    """
+    name = None
+
+    def __init__(self):
+        self.state = None
+        self.version = None
+        self.lock = Lock()
+
+    def build(self):
+        """Состояние индекса по всем объектам в БД."""
+        raise NotImplementedError
+
+    def apply(self, state, ids):
+        """Новое состояние индекса с перечитанными объектами ids."""
+        raise NotImplementedError
+
+    def get_state(self):
+        """Состояние индекса для текущей версии данных."""
+        version = get_version(self.name)
+        with self.lock:
+            if self.version != version:
+                ids = get_changes(self.name, self.version, version)
+                self.state = (
+                    self.build() if ids is None
+                    else self.apply(self.state, ids)
+                )
+                self.version = version
+            return self.state
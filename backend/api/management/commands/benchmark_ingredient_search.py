@@ -0,0 +1,105 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.autocomplete import IngredientIndex
+from recipes.models import Ingredient
+
+ROWS = 50000
+QUERIES = 500
+SEED = 1
+SYLLABLES = (
+    'ка', 'ра', 'мо', 'ло', 'ку', 'ри', 'са', 'пе', 'ре', 'ц', 'ма', 'ту',
+    'ро', 'ни', 'сыр', 'мя', 'со', 'ль', 'ба', 'то', 'ви', 'ш', 'ня', 'го',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.')
+PERCENTILES = (50, 95)
+
+
+def make_name(generator, number):
+    word = ''.join(generator.choices(SYLLABLES, k=generator.randint(2, 4)))
+    return f'{word.capitalize()} {number}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск ингредиентов по префиксу: индекс в памяти, '
+        'фильтр istartswith по функциональному индексу и тот же фильтр '
+        'без индекса (только PostgreSQL). Недостающие до --rows '
+        'ингредиенты создаются в транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=ROWS)
+        parser.add_argument('--queries', type=int, default=QUERIES)
+
+    def handle(self, *args, **kwargs):
+        generator = random.Random(SEED)
+        with transaction.atomic():
+            self.seed(generator, kwargs['rows'])
+            names = list(Ingredient.objects.values_list('name', flat=True))
+            prefixes = [
+                name[:generator.randint(1, 4)]
+                for name in generator.choices(names, k=kwargs['queries'])
+            ]
+            self.stdout.write(
+                f'Ингредиентов: {len(names)}, запросов: {len(prefixes)}.'
+            )
+            index = IngredientIndex()
+            started = time.perf_counter()
+            index.get_state()
+            self.stdout.write(
+                'Построение индекса в памяти: '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс.'
+            )
+            self.measure('Индекс в памяти', prefixes, index.search)
+            self.measure('Функциональный индекс', prefixes, self.filter)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_indexscan = off')
+                    cursor.execute('SET LOCAL enable_bitmapscan = off')
+                self.measure('Фильтр без индекса', prefixes, self.filter)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def seed(generator, rows):
+        missing = rows - Ingredient.objects.count()
+        if missing <= 0:
+            return
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=make_name(generator, number),
+                    measurement_unit=generator.choice(UNITS),
+                )
+                for number in range(missing)
+            ),
+            batch_size=1000,
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Ingredient._meta.db_table}')
+
+    @staticmethod
+    def filter(prefix):
+        return list(Ingredient.objects.filter(name__istartswith=prefix))
+
+    def measure(self, title, prefixes, search):
+        timings = []
+        found = 0
+        for prefix in prefixes:
+            started = time.perf_counter()
+            found += len(search(prefix))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        values = ', '.join(
+            f'p{percentile} '
+            f'{timings[len(timings) * percentile // 100] * 1000:.2f}'
+            for percentile in PERCENTILES
+        )
+        self.stdout.write(
+            f'{title}: всего {sum(timings) * 1000:.0f} мс, {values} мс '
+            f'на запрос, найдено {found}.'
+        )
@@ -0,0 +1,199 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+RECIPES = 600
+RECIPE_INGREDIENTS = (3, 12)
+RECIPE_TAGS = 2
+REPEATS = 5
+SEED = 1
+
+
+class NestedRecipeSerializer(RecipeSerializer):
+    """RecipeSerializer с обычным обходом полей DRF, без кеша и строк."""
+
+    class Meta(RecipeSerializer.Meta):
+        list_serializer_class = serializers.ListSerializer
+
+    def to_representation(self, instance):
+        return serializers.ModelSerializer.to_representation(self, instance)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость сериализации рецепта в списке: вложенные '
+        'сериализаторы DRF с prefetch, сборку из строк .values_list() '
+        'при промахе кеша фрагментов и фрагменты из кеша. В замер входят '
+        'запросы к БД и рендер JSON, кеш на время замера в памяти '
+        'процесса. Недостающие до --recipes рецепты создаются '
+        'в транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=RECIPES)
+        parser.add_argument('--page', type=int, default=None)
+        parser.add_argument('--repeats', type=int, default=REPEATS)
+
+    # Запросы APIRequestFactory приходят с хостом testserver. Фрагменты
+    # всех рецептов должны уместиться в кеш, иначе он их вытесняет.
+    @override_settings(
+        ALLOWED_HOSTS=['testserver'],
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10 ** 6},
+        }},
+    )
+    def handle(self, *args, **kwargs):
+        generator = random.Random(SEED)
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < RECIPE_INGREDIENTS[1]:
+            raise CommandError(
+                'Мало ингредиентов: загрузите их командой '
+                'ingredients_from_data.'
+            )
+        with transaction.atomic():
+            self.seed(generator, kwargs['recipes'], ingredient_ids)
+            view = self.get_view()
+            page = kwargs['page'] or view.paginator.page_size
+            queryset = view.get_queryset().order_by('-pub_date', '-id')
+            recipes = list(queryset[:kwargs['recipes']])
+            pages = [
+                [recipe.pk for recipe in recipes[start:start + page]]
+                for start in range(0, len(recipes), page)
+            ]
+            self.stdout.write(
+                f'Рецептов: {len(recipes)}, страниц по {page}: '
+                f'{len(pages)}.'
+            )
+            context = {'request': view.request}
+            results = [
+                self.measure(
+                    title, queryset, pages, kwargs['repeats'],
+                    lambda recipes, serialize=serialize: serialize(
+                        recipes, context,
+                    ),
+                )
+                for title, serialize in (
+                    ('Вложенные сериализаторы DRF', self.nested),
+                    ('Сборка из строк, промах кеша', self.rendered),
+                    ('Фрагменты из кеша', self.cached),
+                )
+            ]
+            if any(result != results[0] for result in results):
+                raise CommandError('Представления рецептов различаются.')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def seed(generator, count, ingredient_ids):
+        missing = count - Recipe.objects.count()
+        if missing <= 0:
+            return
+        author = User.objects.create(
+            email='benchmark@foodgram.ru', username='benchmark',
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f'Рецепт {number}', text='Описание',
+                    cooking_time=10, author=author,
+                    image='recipes/benchmark.png',
+                )
+                for number in range(missing)
+            ),
+            batch_size=1000,
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(author=author).values_list('id', flat=True)
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in generator.sample(
+                    tag_ids, min(RECIPE_TAGS, len(tag_ids)),
+                )
+            ),
+            batch_size=5000,
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=generator.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in generator.sample(
+                    ingredient_ids, generator.randint(*RECIPE_INGREDIENTS),
+                )
+            ),
+            batch_size=5000,
+        )
+
+    @staticmethod
+    def get_view():
+        user = User.objects.order_by('-is_superuser', 'id').first()
+        request = APIRequestFactory().get('/api/recipes/')
+        force_authenticate(request, user)
+        view = RecipeViewSet(action='list', format_kwarg=None)
+        view.request = Request(request)
+        view.request.user = user
+        return view
+
+    @staticmethod
+    def nested(recipes, context):
+        """Как до сборки из строк: prefetch и обход полей DRF."""
+        prefetch_related_objects(
+            recipes, 'tags', 'recipeingredient_set__ingredient',
+        )
+        return NestedRecipeSerializer(recipes, many=True, context=context).data
+
+    @staticmethod
+    def rendered(recipes, context):
+        """Сборка из строк без кеша фрагментов."""
+        serializer = RecipeSerializer(context=context)
+        return [
+            serializer.add_personal_fields(recipe, fragment)
+            for recipe, fragment in zip(recipes, serializer.render(recipes))
+        ]
+
+    @staticmethod
+    def cached(recipes, context):
+        """Ответ как в API: фрагменты из кеша, прогретого первым повтором."""
+        return RecipeSerializer(recipes, many=True, context=context).data
+
+    def measure(self, title, queryset, pages, repeats, serialize):
+        """
+        Лучшее из repeats время на рецепт. Рецепты страницы читаются
+        заново на каждый повтор и вне замера, чтобы не было prefetch
+        и кеша атрибутов от предыдущего прохода.
+        """
+        best = None
+        for _ in range(repeats):
+            elapsed = 0
+            rendered = []
+            for ids in pages:
+                recipes = list(queryset.filter(pk__in=ids))
+                started = time.perf_counter()
+                rendered.append(JSONRenderer().render(serialize(recipes)))
+                elapsed += time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        count = sum(map(len, pages))
+        self.stdout.write(
+            f'{title}: {best / count * 10 ** 6:.0f} мкс на рецепт, '
+            f'{best * 1000:.0f} мс на {count}.'
+        )
+        return rendered
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+CONNECTIONS = 500
+DURATION = 30
+PERCENTILES = (50, 95, 99)
+CLIENT_ERRORS = (OSError, ValueError, asyncio.IncompleteReadError)
+
+
+async def read_response(reader):
+    """Читает ответ HTTP/1.1: (код ответа, нужно ли закрыть соединение)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером.')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, True
+    return status, headers.get('connection') == 'close'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: держит заданное число одновременных соединений '
+        'с эндпоинтом и выводит пропускную способность и перцентили '
+        'времени ответа. Для сравнения запустите его против make run '
+        '(WSGI) и make run-asgi (ASGI) с одинаковым числом воркеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url', help='Например http://localhost:8000/api/recipes/',
+        )
+        parser.add_argument('--connections', type=int, default=CONNECTIONS)
+        parser.add_argument(
+            '--duration', type=int, default=DURATION, help='Секунды.',
+        )
+        parser.add_argument(
+            '--token', help='Токен для заголовка Authorization.',
+        )
+
+    def handle(self, *args, **kwargs):
+        url = urlsplit(kwargs['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Нужен адрес вида http://host:port/path.')
+        path = url.path or '/'
+        if url.query:
+            path = f'{path}?{url.query}'
+        headers = [f'Host: {url.netloc}', 'Connection: keep-alive']
+        if kwargs['token']:
+            headers.append(f'Authorization: Token {kwargs["token"]}')
+        request = (
+            f'GET {path} HTTP/1.1\r\n' + '\r\n'.join(headers) + '\r\n\r\n'
+        ).encode()
+        latencies, statuses, errors = asyncio.run(self.run(
+            url.hostname, url.port or 80, request,
+            kwargs['connections'], kwargs['duration'],
+        ))
+        self.report(latencies, statuses, errors, kwargs['duration'])
+
+    async def run(self, host, port, request, connections, duration):
+        latencies = []
+        statuses = Counter()
+        errors = Counter()
+        deadline = time.monotonic() + duration
+
+        async def client():
+            reader = writer = None
+            while time.monotonic() < deadline:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(
+                            host, port,
+                        )
+                    started = time.perf_counter()
+                    writer.write(request)
+                    await writer.drain()
+                    status, close = await read_response(reader)
+                except CLIENT_ERRORS as error:
+                    errors[type(error).__name__] += 1
+                    close = True
+                else:
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] += 1
+                if close and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        await asyncio.gather(*(client() for _ in range(connections)))
+        return latencies, statuses, errors
+
+    def report(self, latencies, statuses, errors, duration):
+        self.stdout.write(
+            f'Ответов: {len(latencies)}, '
+            f'{len(latencies) / duration:.1f} в секунду.'
+        )
+        self.stdout.write('Коды ответа: ' + ', '.join(
+            f'{status}: {count}' for status, count in sorted(statuses.items())
+        ))
+        if errors:
+            self.stdout.write(self.style.WARNING('Ошибки: ' + ', '.join(
+                f'{name}: {count}' for name, count in errors.most_common()
+            )))
+        if not latencies:
+            return
+        latencies.sort()
+        values = []
+        for percentile in PERCENTILES:
+            index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+            values.append(f'p{percentile} {latencies[index] * 1000:.0f}')
+        self.stdout.write('Время ответа, мс: ' + ', '.join(values))
@@ -0,0 +1,127 @@
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from django.http import HttpResponse
+
+from api.constans import DURATION_BUCKETS
+
+# Запросы к БД текущего HTTP-запроса. ContextVar, а не атрибут
+# соединения: под ASGI view выполняется в другом потоке, но с копией
+# контекста, поэтому запросы к БД попадают в тот же список.
+current_queries = ContextVar('current_queries', default=None)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся параметрами, совпадают."""
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', NUMBER.sub('?', sql)).strip()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка execute_wrapper: записывает SQL и время запроса
+    в список текущего HTTP-запроса, если он есть.
+    """
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((sql, time.perf_counter() - started))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+class Metrics:
+    """
+    Метрики запросов в памяти процесса, отдаются в текстовом
+    формате Prometheus. Каждый воркер считает свои значения.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = defaultdict(Counter)
+        self.buckets = defaultdict(Counter)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name][labels] += value
+
+    def observe_request(self, view, method, status, duration, queries,
+                        db_time, size):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.counters['foodgram_requests_total'][
+                labels + (('status', status),)
+            ] += 1
+            self.counters['foodgram_request_duration_seconds_sum'][
+                labels
+            ] += duration
+            self.counters['foodgram_request_queries_total'][labels] += queries
+            self.counters['foodgram_request_db_seconds_total'][
+                labels
+            ] += db_time
+            self.counters['foodgram_response_bytes_total'][labels] += size
+            buckets = self.buckets[labels]
+            for bucket in DURATION_BUCKETS:
+                if duration <= bucket:
+                    buckets[bucket] += 1
+            buckets['+Inf'] += 1
+
+    def observe_response_size(self, view, method, size):
+        self.inc(
+            'foodgram_response_bytes_total',
+            (('view', view), ('method', method)),
+            size,
+        )
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, values in sorted(self.counters.items()):
+                if name.endswith('_sum'):
+                    continue
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in values.items():
+                    lines.append(f'{name}{{{format_labels(labels)}}} {value}')
+            name = 'foodgram_request_duration_seconds'
+            lines.append(f'# TYPE {name} histogram')
+            durations = self.counters[f'{name}_sum']
+            for labels, buckets in self.buckets.items():
+                for bucket in (*DURATION_BUCKETS, '+Inf'):
+                    le = format_labels(labels + (('le', bucket),))
+                    lines.append(f'{name}_bucket{{{le}}} {buckets[bucket]}')
+                lines.append(
+                    f'{name}_sum{{{format_labels(labels)}}} '
+                    f'{durations[labels]}'
+                )
+                lines.append(
+                    f'{name}_count{{{format_labels(labels)}}} '
+                    f'{buckets["+Inf"]}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def metrics_view(request):
+    """Метрики для Prometheus. Nginx не проксирует этот адрес наружу."""
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4',
+    )
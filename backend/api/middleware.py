@@ -0,0 +1,117 @@
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from api.metrics import current_queries, fingerprint, metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES_IN_LOG = 5
+
+
+def get_view_name(request):
+    """Имя view вида RecipeViewSet.download_shopping_cart."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    cls = getattr(view, 'cls', None)
+    if cls is None:
+        return f'{view.__module__}.{view.__qualname__}'
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class InstrumentationMiddleware:
+    """
+    Записывает для каждого view время ответа, количество и время
+    SQL-запросов и размер ответа. Размер потокового ответа
+    записывается, когда поток прочитан до конца. Запросы сверх
+    REQUEST_QUERY_BUDGET или REQUEST_TIME_BUDGET пишутся в лог вместе
+    с самыми частыми SQL. Работает и в синхронном, и в асинхронном
+    режиме без переключения потоков.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        queries = []
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = []
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, duration, queries):
+        view = get_view_name(request)
+        db_time = sum(query_time for _, query_time in queries)
+        if response.streaming:
+            response.streaming_content = self.count_streamed(
+                response.streaming_content, view, request.method,
+            )
+            size = 0
+        else:
+            size = len(response.content)
+        metrics.observe_request(
+            view, request.method, response.status_code, duration,
+            len(queries), db_time, size,
+        )
+        if (
+            len(queries) > settings.REQUEST_QUERY_BUDGET
+            or duration > settings.REQUEST_TIME_BUDGET
+        ):
+            self.log_over_budget(request, view, duration, queries, db_time)
+
+    @staticmethod
+    def count_streamed(content, view, method):
+        """Отдаёт части ответа дальше и записывает их общий размер."""
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.observe_response_size(view, method, size)
+
+    @staticmethod
+    def log_over_budget(request, view, duration, queries, db_time):
+        counts = Counter()
+        times = Counter()
+        for sql, query_time in queries:
+            key = fingerprint(sql)
+            counts[key] += 1
+            times[key] += query_time
+        statements = '\n'.join(
+            f'  {count} x {times[key] * 1000:.1f} ms: {key}'
+            for key, count in counts.most_common(SLOW_QUERIES_IN_LOG)
+        )
+        logger.warning(
+            '%s %s (%s) превысил бюджет: %.3f с, %d SQL-запросов '
+            '(%.3f с в БД)\n%s',
+            request.method, request.path, view, duration, len(queries),
+            db_time, statements,
+        )
@@ -0,0 +1,154 @@
+import logging
+import traceback
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from api import metrics
+from api.metrics import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Детектор текущего запроса или блока with detect_n_plus_one().
+current_detector = ContextVar('current_detector', default=None)
+
+PROJECT_ROOT = str(settings.BASE_DIR)
+SKIPPED_PATHS = ('site-packages', __file__, metrics.__file__)
+
+
+class NPlusOneError(Exception):
+    """Найдены повторяющиеся запросы, отличающиеся только параметрами."""
+
+
+def get_call_site():
+    """Ближайший к запросу кадр стека из кода проекта."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(PROJECT_ROOT) and not any(
+            path in frame.filename for path in SKIPPED_PATHS
+        ):
+            filename = frame.filename[len(PROJECT_ROOT):].lstrip('/')
+            return f'{filename}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+def detect_query(execute, sql, params, many, context):
+    """Обёртка execute_wrapper: передаёт SQL активному детектору."""
+    detector = current_detector.get()
+    if detector is not None:
+        detector.add(sql)
+    return execute(sql, params, many, context)
+
+
+class QueryDetector:
+    """
+    Собирает отпечатки SQL и места вызова. Отпечаток, повторившийся
+    не меньше threshold раз, считается N+1, если ни одно место вызова
+    не указано в NPLUSONE_IGNORE.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.call_sites = defaultdict(Counter)
+
+    def add(self, sql):
+        self.call_sites[fingerprint(sql)][get_call_site()] += 1
+
+    def problems(self):
+        """Список (отпечаток, количество, места вызова) найденных N+1."""
+        found = []
+        for key, call_sites in self.call_sites.items():
+            count = sum(call_sites.values())
+            if count < self.threshold or any(
+                ignored in call_site
+                for call_site in call_sites
+                for ignored in settings.NPLUSONE_IGNORE
+            ):
+                continue
+            found.append((key, count, call_sites))
+        return found
+
+    def report(self):
+        return '\n'.join(
+            f'{count} x {key}\n' + '\n'.join(
+                f'    {calls} x {call_site}'
+                for call_site, calls in call_sites.most_common()
+            )
+            for key, count, call_sites in self.problems()
+        )
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, raise_error=True):
+    """
+    Ищет N+1 в запросах к БД внутри блока with, например в тестах:
+
+        with detect_n_plus_one():
+            client.get('/api/recipes/')
+
+    При raise_error выбрасывает NPlusOneError с отчётом.
+    """
+    detector = QueryDetector(threshold)
+    token = current_detector.set(detector)
+    try:
+        yield detector
+    finally:
+        current_detector.reset(token)
+    if raise_error and detector.problems():
+        raise NPlusOneError(detector.report())
+
+
+class NPlusOneTestMixin:
+    """
+    Примесь к TestCase: тест падает с NPlusOneError, если в нём
+    найден N+1. Данные для тестов создавайте в setUpTestData или
+    через bulk_create, повторяющиеся INSERT в setUp тоже проверяются.
+    """
+    nplusone_threshold = None
+
+    def setUp(self):
+        super().setUp()
+        detector = detect_n_plus_one(self.nplusone_threshold)
+        detector.__enter__()
+        self.addCleanup(detector.__exit__, None, None, None)
+
+
+class NPlusOneMiddleware:
+    """
+    Детектор N+1 для staging: пишет найденные в запросе N+1 в лог,
+    а при NPLUSONE_RAISE отвечает ошибкой.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with detect_n_plus_one(raise_error=False) as detector:
+            response = self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        with detect_n_plus_one(raise_error=False) as detector:
+            response = await self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    @staticmethod
+    def check(request, detector):
+        if not detector.problems():
+            return
+        report = detector.report()
+        logger.warning(
+            'N+1 в %s %s:\n%s', request.method, request.path, report,
+        )
+        if settings.NPLUSONE_RAISE:
+            raise NPlusOneError(report)
@@ -0,0 +1,144 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError as BadRequest
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу: курсор хранит значения полей сортировки
+    последнего объекта страницы, следующая страница выбирается условием
+    WHERE по этим значениям, без OFFSET и без COUNT(*).
+    Поля сортировки должны однозначно упорядочивать объекты.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.fields = [
+            (field.lstrip('-'), field.startswith('-')) for field in ordering
+        ]
+
+    def encode_cursor(self, instance):
+        values = [getattr(instance, name) for name, _ in self.fields]
+        return urlsafe_b64encode(
+            json.dumps(values, default=str).encode()
+        ).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (DecodeError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, position):
+            lookup = f'{name}__{"lt" if descending else "gt"}'
+            condition |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(
+                self.after(self.decode_cursor(cursor, queryset.model))
+            )
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Постраничная пагинация по умолчанию. Если в запросе есть параметр
+    cursor (для первой страницы пустой), включается пагинация по ключу
+    keyset_ordering: стоимость страницы не растёт с глубиной прокрутки,
+    а общее количество объектов не считается.
+    """
+    keyset_ordering = ('-id',)
+    invalid_ordering_message = (
+        'Курсор нельзя использовать с этой сортировкой или поиском.'
+    )
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Ключ пагинации по курсору. Если запрос отсортирован фильтром,
+        ключом служит его сортировка: она должна состоять из полей модели
+        и заканчиваться первичным ключом, иначе ответ 400.
+        """
+        ordering = queryset.query.order_by
+        if not ordering:
+            return self.keyset_ordering
+        fields = []
+        for name in ordering:
+            if not isinstance(name, str):
+                raise BadRequest(self.invalid_ordering_message)
+            try:
+                field = queryset.model._meta.get_field(name.lstrip('-'))
+            except FieldDoesNotExist:
+                raise BadRequest(self.invalid_ordering_message)
+            if field.is_relation:
+                raise BadRequest(self.invalid_ordering_message)
+            fields.append(field)
+        if not fields[-1].primary_key:
+            raise BadRequest(self.invalid_ordering_message)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_keyset_ordering(queryset))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(HybridPagination):
+    keyset_ordering = ('-pub_date', '-id')
+
+
+class AuthorPagination(HybridPagination):
+    keyset_ordering = ('id',)
@@ -0,0 +1,26 @@
+import json
+
+from rest_framework import renderers
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer):
+    """
+    Рендерер для согласования формата выгрузки списка покупок.
+    Сам файл отдаёт view потоком, здесь рендерятся только ошибки.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
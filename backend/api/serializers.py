@@ -1,13 +1,21 @@
+from collections import OrderedDict, defaultdict
+
+from django.db import models, transaction
+from django.db.models import QuerySet
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from recipes.models import (
     Tag, Recipe, RecipeIngredient, Follow, Favorite, Cart, Ingredient,
+    ShoppingListItem,
 )
+from recipes.changes import recipes_changed
 from users.models import User
-from api.constans import MIN_VALUE
+from api.cache import get_fragments
+from api.constans import MIN_VALUE, TAG_FIELDS
+from api.fields import RecipeImageField, RenditionsField
+from api.utils import get_following_ids, get_recipes_limit
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -38,11 +46,28 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ]
 
 
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    Список объектов с простыми полями модели. Queryset отдаётся
+    через .values() без создания объектов и обхода полей DRF,
+    вложенные списки и списки объектов читаются атрибутами.
+    """
+
+    def to_representation(self, data):
+        names = list(self.child.fields)
+        if isinstance(data, QuerySet):
+            return list(data.values(*names))
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return [{name: getattr(obj, name) for name in names} for obj in data]
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Ingredient."""
     class Meta:
         model = Ingredient
         fields = '__all__'
+        list_serializer_class = ValuesListSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -50,6 +75,7 @@ class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = '__all__'
+        list_serializer_class = ValuesListSerializer
 
 
 class CustomUserSerializer(UserSerializer):
@@ -68,10 +94,12 @@ class CustomUserSerializer(UserSerializer):
         Возвращает True если автор в Подписках у юзера
         и False в остальных случаях.
         """
-        user = self.context.get('request').user
-        if user.is_anonymous:
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(user=user, author=obj.id).exists()
+        return obj.id in get_following_ids(request)
 
 
 class CustomCreateUserSerializer(UserCreateSerializer):
@@ -96,11 +124,12 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
-    """Сериализатор для добавления ингредиентов в рецепты."""
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredient.objects.all()
-    )
+    """
+    Сериализатор для добавления ингредиентов в рецепты.
+    Существование ингредиентов проверяется одним запросом
+    в RecipeCreateSerializer.validate_ingredients.
+    """
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
@@ -109,18 +138,33 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для короткого отображения рецептов."""
+    images = RenditionsField(source='image', renditions=('thumbnail',))
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'images',
             'cooking_time'
         )
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов, общие для всех пользователей части берутся из кеша."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.represent_many(list(recipes))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор для отображения рецептов."""
+    """
+    Сериализатор для отображения рецептов. Представление без полей
+    personal_fields кешируется по id и дате изменения рецепта,
+    поля текущего пользователя вычисляются на каждый запрос.
+    """
     author = CustomUserSerializer()
     tags = TagSerializer(many=True)
     ingredients = RecipeIngredientSerializer(
@@ -129,18 +173,138 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = RenditionsField(source='image')
+    personal_fields = (
+        'is_favorited', 'is_in_shopping_cart', 'author.is_subscribed',
+    )
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'images', 'text', 'cooking_time')
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def render(self, recipes):
+        """
+        Представление рецептов, которых нет в кеше, собранное словарями
+        из строк .values_list(), без обхода вложенных сериализаторов.
+        Запросы повторяют prefetch тегов и ингредиентов, поэтому порядок
+        и содержимое совпадают с обычной сериализацией. Поля
+        из personal_fields заполняются в add_personal_fields.
+        """
+        ids = [recipe.pk for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, *tag in Tag.objects.filter(
+            recipe__in=ids
+        ).values_list('recipe', *TAG_FIELDS):
+            tags[recipe_id].append(dict(zip(TAG_FIELDS, tag)))
+        recipe_ingredients = RecipeIngredient.objects.filter(
+            recipe__in=ids
+        ).values_list('recipe_id', 'ingredient_id', 'amount')
+        recipe_ingredients = list(recipe_ingredients)
+        ingredients = {
+            id: (name, measurement_unit)
+            for id, name, measurement_unit in Ingredient.objects.filter(
+                pk__in={id for _, id, _ in recipe_ingredients}
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+        amounts = defaultdict(list)
+        for recipe_id, ingredient_id, amount in recipe_ingredients:
+            name, measurement_unit = ingredients[ingredient_id]
+            amounts[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        image = self.fields['image']
+        images = self.fields['images']
+        return [
+            self.fill_fields(recipe, {
+                'id': recipe.pk,
+                'tags': tags[recipe.pk],
+                'author': self.render_author(recipe.author),
+                'ingredients': amounts[recipe.pk],
+                'name': recipe.name,
+                'image': image.to_representation(recipe.image),
+                'images': images.to_representation(recipe.image),
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+            })
+            for recipe in recipes
+        ]
+
+    def render_author(self, author):
+        """
+        Автор по полям сериализатора author, поля из personal_fields
+        заполняются в add_personal_fields.
+        """
+        data = OrderedDict()
+        for name, field in self.fields['author'].fields.items():
+            if f'author.{name}' in self.personal_fields:
+                data[name] = None
+            else:
+                data[name] = field.to_representation(
+                    field.get_attribute(author)
+                )
+        return data
+
+    def fill_fields(self, recipe, values):
+        """
+        Располагает поля в порядке Meta.fields. Поля, которых нет
+        в values и personal_fields, сериализуются обычным способом.
+        """
+        data = OrderedDict()
+        for name, field in self.fields.items():
+            if name in values:
+                data[name] = values[name]
+            elif name in self.personal_fields:
+                data[name] = None
+            else:
+                data[name] = field.to_representation(
+                    field.get_attribute(recipe)
+                )
+        return data
+
+    def represent_many(self, recipes):
+        fragments = get_fragments(
+            type(self).__name__, recipes, self.render,
+            self.context.get('request'),
+        )
+        return [
+            self.add_personal_fields(recipe, fragments[recipe.pk])
+            for recipe in recipes
+        ]
+
+    def add_personal_fields(self, recipe, fragment):
+        """Копия фрагмента с полями текущего пользователя."""
+        data = OrderedDict(fragment)
+        for path in self.personal_fields:
+            *parents, name = path.split('.')
+            target, serializer, instance = data, self, recipe
+            for parent in parents:
+                serializer = serializer.fields[parent]
+                instance = serializer.get_attribute(instance)
+                target[parent] = OrderedDict(target[parent])
+                target = target[parent]
+            field = serializer.fields[name]
+            target[name] = field.to_representation(
+                field.get_attribute(instance)
+            )
+        return data
 
     def get_is_favorited(self, obj):
         """
         Возвращает True если рецепт в Избанном у юзера
-        и False в остальных случаях.
+        и False в остальных случаях. Использует аннотацию из queryset,
+        если она есть.
         """
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -151,9 +315,11 @@ class RecipeSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj):
         """
         Возвращает True если рецепт в Корзине юзера
-        и False в остальных случаях.
+        и False в остальных случаях. Использует аннотацию из queryset,
+        если она есть.
         """
-
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -162,10 +328,58 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
 
+class RecipeMatchQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE),
+        allow_empty=False,
+    )
+    missing = serializers.IntegerField(min_value=0, default=0)
+
+
+class RecipeMatchSerializer(RecipeSerializer):
+    """Рецепт с количеством имеющихся и недостающих ингредиентов."""
+    available_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+    personal_fields = RecipeSerializer.personal_fields + (
+        'available_count', 'missing_count',
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'available_count', 'missing_count',
+        )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """
+    Продукт из списка покупок с количеством по рецептам.
+    Рецепты идут по возрастанию id: jsonb не хранит порядок ключей.
+    """
+    recipes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('name', 'measurement_unit', 'amount', 'recipes')
+
+    def get_recipes(self, object):
+        recipe_names = self.context['recipe_names']
+        return [
+            {
+                'id': int(recipe_id),
+                'name': recipe_names.get(int(recipe_id)),
+                'amount': amount,
+            }
+            for recipe_id, amount in sorted(
+                object.recipes.items(), key=lambda item: int(item[0])
+            )
+        ]
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и изменения рецептов."""
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    image = Base64ImageField(use_url=True, max_length=None)
+    image = RecipeImageField(use_url=True, max_length=None)
 
     class Meta:
         model = Recipe
@@ -215,32 +429,70 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     'Количество ингредиента не может быть меньше 1.'
                 )
-        return ingredients
+        found = Ingredient.objects.in_bulk(list_ingredients)
+        missing = [id for id in list_ingredients if id not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(map(str, missing))}.'
+            )
+        return [
+            {'ingredient': found[ingredient['id']],
+             'amount': ingredient['amount']}
+            for ingredient in ingredients
+        ]
 
+    def update_ingredients(self, ingredients, instance):
+        """
+        Приводит ингредиенты рецепта к переданным минимальным набором
+        запросов: удаляет лишние, меняет количество и добавляет новые.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in instance.recipeingredient_set.all()
+        }
+        changed = []
+        added = []
+        for ingredient_data in ingredients:
+            recipe_ingredient = current.pop(
+                ingredient_data['ingredient'].id, None
+            )
+            if recipe_ingredient is None:
+                added.append(ingredient_data)
+            elif recipe_ingredient.amount != ingredient_data['amount']:
+                recipe_ingredient.amount = ingredient_data['amount']
+                changed.append(recipe_ingredient)
+        if current:
+            RecipeIngredient.objects.filter(
+                recipe=instance, ingredient_id__in=current
+            ).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            self.add_ingredients(added, instance)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта."""
         ingredients = validated_data.pop('ingredients')
         instance = super().create(validated_data)
         self.add_ingredients(ingredients, instance)
+        recipes_changed([instance.pk])
         return instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта."""
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time,
-        )
-        instance.tags.clear()
-        instance.ingredients.clear()
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.add(*tags)
-        recipe = instance
-        self.add_ingredients(ingredients, recipe)
-        instance.save()
+        """
+        Обновление рецепта. Теги и ингредиенты меняются только если
+        переданы, и только те строки, которые действительно изменились.
+        """
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(ingredients, instance)
+        recipes_changed([instance.pk])
         return instance
 
 
@@ -286,12 +538,14 @@ class SubscriptionShowSerializer(CustomUserSerializer):
 
     def get_recipes(self, object):
         """Список рецептов для карточки автора на странице подписок."""
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        author_recipes = object.recipes.all()
-        if limit:
-            author_recipes = author_recipes[:int(limit)]
+        if hasattr(object, 'limited_recipes'):
+            author_recipes = object.limited_recipes
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            author_recipes = object.recipes.all()[:limit]
         return RecipeShortSerializer(author_recipes, many=True).data
 
     def get_recipes_count(self, object):
+        if hasattr(object, 'recipes_count'):
+            return object.recipes_count
         return object.recipes.count()
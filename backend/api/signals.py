@@ -0,0 +1,109 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.cache import bump_version, fragment_cache_used, publish_changes
+from api.feed import invalidate_author, invalidate_user
+from api.metrics import metrics, record_query
+from api.nplusone import detect_query
+from recipes import shopping_list
+from recipes.models import Cart, Follow, Ingredient, Recipe, Tag
+from recipes.changes import recipes_changed, touch_recipes
+from users.models import User
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    for wrapper in (record_query, detect_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+@receiver(fragment_cache_used)
+def count_fragments(sender, hits, misses, **kwargs):
+    metrics.inc('foodgram_fragment_cache_total', (
+        ('serializer', sender), ('result', 'hit'),
+    ), hits)
+    metrics.inc('foodgram_fragment_cache_total', (
+        ('serializer', sender), ('result', 'miss'),
+    ), misses)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, 'tag'))
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_touch_recipes(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    transaction.on_commit(
+        partial(publish_changes, 'ingredient', [instance.pk])
+    )
+    if not created:
+        recipes_changed(Recipe.objects.filter(
+            ingredients=instance
+        ).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    # Список id собирается сейчас: после удаления Django обнуляет pk.
+    transaction.on_commit(
+        partial(publish_changes, 'ingredient', [instance.pk])
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(invalidate_author, instance.author_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    for user_id in Cart.objects.filter(
+        recipe=instance
+    ).values_list('user_id', flat=True):
+        shopping_list.remove_recipe(user_id, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(publish_changes, 'recipe', [instance.pk])
+    )
+    transaction.on_commit(partial(invalidate_author, instance.author_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        touch_recipes(Recipe.objects.filter(author=instance))
+        transaction.on_commit(partial(bump_version, 'author'))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, 'author'))
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_user, instance.user_id))
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.nplusone import NPlusOneTestMixin
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+RECIPE_INGREDIENTS = 3
+
+
+@override_settings(
+    ASYNC_READ_THREADS=0,
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }},
+)
+class FoodgramTestCase(NPlusOneTestMixin, TestCase):
+    """
+    Общая основа тестов API: чтение идёт в потоке теста, кеш
+    в памяти процесса и очищается перед каждым тестом. Тест падает,
+    если в нём найден N+1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user',
+            first_name='Иван', last_name='Иванов', password='password',
+        )
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Пётр', last_name='Петров', password='password',
+        )
+        Tag.objects.bulk_create(
+            Tag(
+                name=f'Тег {index}', color=f'#00000{index}',
+                slug=f'tag{index}',
+            )
+            for index in range(3)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(10)
+        )
+        # SQLite не возвращает id из bulk_create.
+        cls.tags = list(Tag.objects.order_by('id'))
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count, author=None, tags=None, ingredients=None):
+        """Рецепты с тегами и ингредиентами без сигналов на каждую связь."""
+        existing = Recipe.objects.count()
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {existing + index}', text='Описание',
+                cooking_time=10, author=author or self.author,
+                image='recipes/image.png',
+            )
+            for index in range(count)
+        )
+        recipes = list(Recipe.objects.order_by('-id')[:count])
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in (tags if tags is not None else self.tags[:2])
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+            for recipe in recipes
+            for ingredient in (
+                ingredients if ingredients is not None
+                else self.ingredients[:RECIPE_INGREDIENTS]
+            )
+        )
+        return recipes
@@ -0,0 +1,42 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL.')
+class HealthCheckTest(SimpleTestCase):
+    """Постоянное соединение проверяется перед первым запросом к БД."""
+    databases = {'default'}
+
+    def setUp(self):
+        patcher = mock.patch.dict(connection.settings_dict, {
+            'CONN_HEALTH_CHECKS': True, 'CONN_MAX_AGE': 60,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        connection.ensure_connection()
+
+    def start_request(self):
+        connection.close_if_unusable_or_obsolete()
+
+    def query(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_checked_once_before_first_query(self):
+        with mock.patch.object(
+            connection, 'is_usable', return_value=True,
+        ) as is_usable:
+            self.start_request()
+            self.assertEqual(is_usable.call_count, 0)
+            self.query()
+            self.query()
+        self.assertEqual(is_usable.call_count, 1)
+
+    def test_broken_connection_is_reopened(self):
+        self.start_request()
+        broken = connection.connection
+        with mock.patch.object(connection, 'is_usable', return_value=False):
+            self.query()
+        self.assertIsNot(connection.connection, broken)
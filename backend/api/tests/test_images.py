@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from recipes.images import (
+    RENDITION_FORMAT, make_renditions, rendition_name, strip_metadata,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def palette_png():
+    """PNG с палитрой, где цвет 0 прозрачный, а один пиксель красный."""
+    image = Image.new('P', (4, 4), 0)
+    image.putpalette([255, 255, 255, 255, 0, 0] + [0] * 762)
+    image.putpixel((0, 0), 1)
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', transparency=0)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageTransparencyTest(SimpleTestCase):
+    """Прозрачный фон сохраняется в оригинале и в копиях."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_strip_metadata_keeps_transparency(self):
+        image = Image.open(BytesIO(strip_metadata(palette_png())))
+        self.assertEqual(image.info.get('transparency'), 0)
+        self.assertEqual(image.convert('RGBA').getpixel((1, 1))[3], 0)
+
+    def test_renditions_keep_transparency(self):
+        name = default_storage.save(
+            'recipes/images/transparent.png', ContentFile(palette_png()),
+        )
+        make_renditions(name)
+        with default_storage.open(rendition_name(name, 'thumbnail')) as file:
+            image = Image.open(file)
+            image.load()
+        if RENDITION_FORMAT == 'JPEG':
+            self.assertEqual(image.mode, 'RGB')
+        else:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((3, 3))[3], 0)
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from api.autocomplete import IngredientIndex
+from api.cache import bump_version
+from api.tests.base import FoodgramTestCase
+from recipes.changes import recipes_changed
+from recipes.matching import RecipeMatcher
+from recipes.models import Ingredient, RecipeIngredient
+from recipes.search import RecipeSearchIndex
+
+
+class VersionedIndexTest(FoodgramTestCase):
+    """
+    Индекс другого воркера догоняет версию по опубликованным id,
+    а не перестраивается целиком.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.create_recipes(1)
+
+    def without_build(self, index):
+        return mock.patch.object(index, 'build', side_effect=AssertionError)
+
+    def test_recipe_indexes_apply_changes(self):
+        matcher = RecipeMatcher()
+        search = RecipeSearchIndex()
+        matcher.get_state()
+        search.get_state()
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.ingredients[9], amount=1,
+            )
+            recipes_changed([self.recipe.id])
+        with self.without_build(matcher), self.without_build(search):
+            self.assertEqual(
+                matcher.match([self.ingredients[9].id]),
+                [(self.recipe.id, 1, 1)],
+            )
+            self.assertEqual(
+                search.search('ингредиент 9'), [self.recipe.id],
+            )
+            self.assertEqual(search.search('ингредиент 1'), [])
+        self.assertEqual(search.get_state(), RecipeSearchIndex().build())
+        self.assertEqual(matcher.get_state(), RecipeMatcher().build())
+
+    def test_ingredient_index_applies_changes(self):
+        index = IngredientIndex()
+        index.get_state()
+        with self.captureOnCommitCallbacks(execute=True):
+            flour = Ingredient.objects.create(
+                name='Мука', measurement_unit='г',
+            )
+        with self.without_build(index):
+            self.assertEqual(index.search('мук'), [flour])
+        with self.captureOnCommitCallbacks(execute=True):
+            flour.delete()
+        with self.without_build(index):
+            self.assertEqual(index.search('мук'), [])
+
+    def test_unknown_changes_rebuild(self):
+        matcher = RecipeMatcher()
+        matcher.get_state()
+        bump_version('recipe')
+        with mock.patch.object(
+            matcher, 'build', wraps=matcher.build,
+        ) as build:
+            matcher.get_state()
+        build.assert_called_once()
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import FoodgramTestCase
+from recipes.models import Ingredient
+
+INGREDIENTS_URL = '/api/ingredients/'
+
+
+class IngredientSearchTest(FoodgramTestCase):
+    """Поиск ингредиентов по началу названия."""
+
+    def search(self, name):
+        response = self.client.get(INGREDIENTS_URL, {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(self.search('ингредиент 1'), ['Ингредиент 1'])
+        self.assertEqual(self.search('ИНГРЕДИЕНТ 9'), ['Ингредиент 9'])
+        self.assertEqual(self.search('редиент'), [])
+
+    def test_index_matches_database_search(self):
+        from_index = self.search('Ингр')
+        with override_settings(INGREDIENT_INDEX_IN_MEMORY=False):
+            # Иначе ответ с индексом в памяти отдаётся из кеша.
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                from_database = self.search('Ингр')
+        self.assertTrue(any(
+            'LIKE' in query['sql'] and 'recipes_ingredient' in query['sql']
+            for query in queries
+        ))
+        self.assertEqual(from_database, from_index)
+        self.assertEqual(len(from_index), len(self.ingredients))
+
+    def test_index_follows_committed_changes(self):
+        self.assertEqual(self.search('Мука'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            flour = Ingredient.objects.create(
+                name='Мука', measurement_unit='г',
+            )
+        self.assertEqual(self.search('мук'), ['Мука'])
+        with self.captureOnCommitCallbacks(execute=True):
+            flour.delete()
+        self.assertEqual(self.search('мук'), [])
@@ -0,0 +1,32 @@
+from django.test import Client
+
+from api.nplusone import NPlusOneError, detect_n_plus_one
+from api.tests.base import FoodgramTestCase
+from users.models import User
+
+RECIPES = 6
+
+
+class NPlusOneDetectorTest(FoodgramTestCase):
+    """Детектор находит повторяющиеся запросы и место их вызова."""
+
+    def test_admin_recipe_list_queries_tags_per_recipe(self):
+        self.create_recipes(RECIPES)
+        admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin',
+            first_name='Админ', last_name='Админов', password='password',
+        )
+        client = Client()
+        client.force_login(admin)
+        with self.assertRaises(NPlusOneError) as error:
+            with detect_n_plus_one():
+                response = client.get('/admin/recipes/recipe/')
+                self.assertEqual(response.status_code, 200)
+        self.assertIn('recipes/admin.py', str(error.exception))
+        self.assertIn('in get_tags', str(error.exception))
+
+    def test_recipe_list_has_no_n_plus_one(self):
+        self.create_recipes(RECIPES)
+        with detect_n_plus_one(threshold=2):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(len(response.data['results']), RECIPES)
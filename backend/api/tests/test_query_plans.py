@@ -0,0 +1,82 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.autocomplete import ingredient_index
+from api.filters import get_tag_ids
+from api.tests.base import FoodgramTestCase
+from api.views import IngredientViewSet
+from recipes import shopping_list
+from recipes.management.commands.explain_queries import HOT_REQUESTS
+from recipes.models import Cart, Favorite, Follow
+
+INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL.')
+class QueryPlanTest(FoodgramTestCase):
+    """
+    Каждый SELECT горячих эндпоинтов читает таблицы через индекс.
+    На маленьких тестовых таблицах планировщик выбрал бы полный
+    просмотр, поэтому он запрещён: Seq Scan остаётся в плане,
+    только если подходящего индекса нет.
+    """
+    # Горячие запросы выполняются подряд и повторяют одни и те же SELECT.
+    nplusone_threshold = 100
+
+    def setUp(self):
+        super().setUp()
+        recipes = self.create_recipes(30)
+        Favorite.objects.bulk_create(
+            Favorite(user=self.user, recipe=recipe) for recipe in recipes[:5]
+        )
+        Cart.objects.bulk_create(
+            Cart(user=self.user, recipe=recipe) for recipe in recipes[:5]
+        )
+        shopping_list.rebuild([self.user.id])
+        Follow.objects.create(user=self.user, author=self.author)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assert_index_scans(self, viewset, action, params):
+        cache.clear()
+        # Теги в кеше и индекс ингредиентов в памяти читают таблицу
+        # целиком один раз на версию данных, а не на каждый запрос.
+        get_tag_ids()
+        ingredient_index.get_state()
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = viewset.as_view({'get': action})(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            with self.subTest(view=viewset.__name__, params=params, sql=sql):
+                self.assertTrue(
+                    any(scan in plan for scan in INDEX_SCANS), plan,
+                )
+                self.assertNotIn('Seq Scan', plan)
+
+    def test_hot_requests(self):
+        for viewset, action, params in HOT_REQUESTS:
+            self.assert_index_scans(viewset, action, {
+                name: str(value).format(
+                    tag=self.tags[0].slug, author=self.author.id,
+                )
+                for name, value in params.items()
+            })
+
+    @override_settings(INGREDIENT_INDEX_IN_MEMORY=False)
+    def test_ingredient_search_in_database(self):
+        self.assert_index_scans(IngredientViewSet, 'list', {'name': 'Ингр'})
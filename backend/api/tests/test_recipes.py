@@ -0,0 +1,170 @@
+from django.core.cache import cache
+
+from api.tests.base import FoodgramTestCase
+from recipes.models import Recipe
+
+RECIPES_URL = '/api/recipes/'
+# count, страница рецептов, подписки пользователя, теги,
+# строки ингредиентов и ингредиенты рецептов страницы.
+LIST_QUERIES = 6
+ANONYMOUS_LIST_QUERIES = 5
+
+
+class RecipeListQueriesTest(FoodgramTestCase):
+    """Количество запросов списка рецептов не зависит от их числа."""
+
+    def assert_list_queries(self, count):
+        for recipes in (2, 6):
+            self.create_recipes(recipes)
+            cache.clear()
+            with self.assertNumQueries(count):
+                response = self.client.get(RECIPES_URL)
+            self.assertEqual(response.status_code, 200)
+
+    def test_authenticated_list(self):
+        self.assert_list_queries(LIST_QUERIES)
+
+    def test_anonymous_list(self):
+        self.client.force_authenticate(None)
+        self.assert_list_queries(ANONYMOUS_LIST_QUERIES)
+
+    def test_cached_fragments_skip_rendering_queries(self):
+        self.create_recipes(6)
+        self.client.get(RECIPES_URL)
+        with self.assertNumQueries(LIST_QUERIES - 3):
+            self.client.get(RECIPES_URL)
+
+
+class RecipeCursorTest(FoodgramTestCase):
+    """Пагинация по курсору следует сортировке запроса."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(8)
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get(RECIPES_URL, {**params, 'cursor': ''})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_default_ordering(self):
+        self.assertEqual(
+            self.walk({}),
+            [recipe.id for recipe in sorted(
+                self.recipes, key=lambda recipe: (recipe.pub_date, recipe.id),
+                reverse=True,
+            )],
+        )
+
+    def test_popular_ordering_is_stable(self):
+        for recipe, count in zip(self.recipes, (3, 1, 3, 0, 1, 3, 0, 1)):
+            recipe.favorites_count = count
+        Recipe.objects.bulk_update(self.recipes, ['favorites_count'])
+        expected = [recipe.id for recipe in sorted(
+            self.recipes,
+            key=lambda recipe: (
+                recipe.favorites_count, recipe.pub_date, recipe.id,
+            ),
+            reverse=True,
+        )]
+        params = {'ordering': '-favorites_count'}
+        pages = [
+            self.client.get(RECIPES_URL, {**params, 'page': page})
+            for page in (1, 2)
+        ]
+        self.assertEqual(
+            [recipe['id'] for response in pages
+             for recipe in response.data['results']],
+            expected,
+        )
+        self.assertEqual(self.walk(params), expected)
+
+    def test_search_with_cursor_is_rejected(self):
+        response = self.client.get(
+            RECIPES_URL, {'search': 'Рецепт', 'cursor': ''},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeTagFilterTest(FoodgramTestCase):
+    """Фильтр по тегам без дублей рецептов и лишних запросов."""
+
+    def setUp(self):
+        super().setUp()
+        self.both = self.create_recipes(2, tags=self.tags[:2])
+        self.first = self.create_recipes(1, tags=self.tags[:1])
+        self.create_recipes(1, tags=self.tags[2:])
+
+    def get_ids(self, params):
+        response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), response.data['count'])
+        return ids
+
+    def test_any_tag_returns_each_recipe_once(self):
+        ids = self.get_ids({'tags': [tag.slug for tag in self.tags[:2]]})
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertCountEqual(
+            ids, [recipe.id for recipe in self.both + self.first],
+        )
+
+    def test_all_tags(self):
+        ids = self.get_ids({
+            'tags': [tag.slug for tag in self.tags[:2]], 'tags_match': 'all',
+        })
+        self.assertCountEqual(ids, [recipe.id for recipe in self.both])
+
+    def test_queries_do_not_grow_with_tags(self):
+        for tags in (self.tags[:1], self.tags):
+            cache.clear()
+            # Словарь тегов, count, страница, подписки, теги,
+            # строки ингредиентов и ингредиенты рецептов страницы.
+            with self.assertNumQueries(LIST_QUERIES + 1):
+                self.client.get(
+                    RECIPES_URL, {'tags': [tag.slug for tag in tags]},
+                )
+
+
+class RecipeMatchTest(FoodgramTestCase):
+    """Подбор рецептов по имеющимся ингредиентам."""
+
+    def setUp(self):
+        super().setUp()
+        self.soup, = self.create_recipes(
+            1, ingredients=self.ingredients[:2],
+        )
+        self.salad, = self.create_recipes(
+            1, ingredients=self.ingredients[2:5],
+        )
+
+    def match(self, ingredients, missing=0):
+        response = self.client.get(f'{RECIPES_URL}match/', {
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'missing': missing,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['id'], recipe['available_count'], recipe['missing_count'])
+            for recipe in response.data['results']
+        ]
+
+    def test_all_ingredients_available(self):
+        self.assertEqual(
+            self.match(self.ingredients[:2]), [(self.soup.id, 2, 0)],
+        )
+
+    def test_missing_ingredients(self):
+        self.assertEqual(self.match(self.ingredients[1:4]), [])
+        self.assertEqual(self.match(self.ingredients[1:4], missing=1), [
+            (self.salad.id, 2, 1), (self.soup.id, 1, 1),
+        ])
+
+    def test_invalid_ingredients(self):
+        response = self.client.get(f'{RECIPES_URL}match/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,75 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.db.models import prefetch_related_objects
+from django.test import override_settings
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.management.commands.benchmark_serialization import (
+    NestedRecipeSerializer,
+)
+from api.serializers import RecipeSerializer
+from api.tests.base import FoodgramTestCase
+from api.views import RecipeViewSet
+from recipes.models import Cart, Favorite, Follow
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeRepresentationTest(FoodgramTestCase):
+    """Представление рецептов совпадает с обычной сериализацией DRF."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_request(self):
+        request = APIRequestFactory().get('/api/recipes/')
+        force_authenticate(request, self.user)
+        view = RecipeViewSet(action='list', format_kwarg=None)
+        view.request = Request(request)
+        view.request.user = self.user
+        return view.request, view.get_queryset()
+
+    def test_list_matches_nested_serialization(self):
+        recipes = self.create_recipes(4)
+        self.create_recipes(2, author=self.user, tags=[self.tags[2]])
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        Cart.objects.create(user=self.user, recipe=recipes[1])
+        Follow.objects.create(user=self.user, author=self.author)
+        request, queryset = self.get_request()
+        recipes = list(queryset)
+        context = {'request': request}
+        rendered = JSONRenderer().render(RecipeSerializer(
+            recipes, many=True, context=context,
+        ).data)
+        prefetch_related_objects(
+            recipes, 'tags', 'recipeingredient_set__ingredient',
+        )
+        self.assertEqual(rendered, JSONRenderer().render(
+            NestedRecipeSerializer(recipes, many=True, context=context).data
+        ))
+
+    def test_create_response_matches_detail(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2, 2), 'red').save(buffer, 'PNG')
+        image = base64.b64encode(buffer.getvalue()).decode()
+        response = self.client.post('/api/recipes/', {
+            'name': 'Суп', 'text': 'Описание', 'cooking_time': 30,
+            'image': f'data:image/png;base64,{image}',
+            'tags': [self.tags[0].id, self.tags[1].id],
+            'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 100},
+                {'id': self.ingredients[1].id, 'amount': 5},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        detail = self.client.get(f'/api/recipes/{response.data["id"]}/')
+        self.assertEqual(response.content, detail.content)
@@ -0,0 +1,165 @@
+import json
+
+from django.test import SimpleTestCase
+
+from api.exporters import CSVExporter, JSONExporter, TextExporter
+from api.metrics import metrics
+from api.tests.base import FoodgramTestCase
+from recipes import shopping_list
+from recipes.models import (
+    Cart, Ingredient, RecipeIngredient, ShoppingListItem,
+)
+
+SHOPPING_LIST_URL = '/api/recipes/shopping_list/'
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListTest(FoodgramTestCase):
+    """Список покупок собирается по корзине пользователя."""
+    # Тест делает несколько запросов к корзине подряд, каждый
+    # из них читает рецепт по id.
+    nplusone_threshold = 10
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(2)
+
+    def test_cart_changes_update_list(self):
+        for recipe in self.recipes:
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/',
+            )
+            self.assertEqual(response.status_code, 201)
+        response = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(
+            [(item['name'], item['amount']) for item in response.data],
+            [(ingredient.name, 10) for ingredient in self.ingredients[:3]],
+        )
+        self.client.delete(f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        response = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(
+            [item['amount'] for item in response.data], [5, 5, 5],
+        )
+
+    def test_list_is_built_for_carts_without_it(self):
+        Cart.objects.bulk_create(
+            Cart(user=self.user, recipe=recipe) for recipe in self.recipes
+        )
+        response = self.client.get(DOWNLOAD_URL, {'format': 'txt'})
+        content = b''.join(response.streaming_content).decode()
+        for ingredient in self.ingredients[:3]:
+            self.assertIn(ingredient.name, content)
+        self.assertEqual(
+            ShoppingListItem.objects.filter(user=self.user).count(), 3,
+        )
+
+    def test_streamed_size_is_recorded(self):
+        Cart.objects.create(user=self.user, recipe=self.recipes[0])
+        counter = metrics.counters['foodgram_response_bytes_total']
+        labels = (('view', 'RecipeViewSet.download_shopping_cart'),
+                  ('method', 'GET'))
+        before = counter[labels]
+        response = self.client.get(DOWNLOAD_URL, {'format': 'txt'})
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content)
+        self.assertEqual(counter[labels] - before, len(content))
+
+    def test_empty_cart(self):
+        response = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(response.data, [])
+
+    def test_units_are_normalized_per_recipe(self):
+        units = ('кг', 'г', 'л', 'мл')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in zip(('Мука', 'Мука', 'Молоко', 'Молоко'), units)
+        )
+        ingredients = {
+            ingredient.measurement_unit: ingredient
+            for ingredient in Ingredient.objects.filter(
+                measurement_unit__in=units,
+            )
+        }
+        second, first = self.create_recipes(2, ingredients=[])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=first, ingredient=ingredients['кг'], amount=1,
+            ),
+            RecipeIngredient(
+                recipe=first, ingredient=ingredients['л'], amount=2,
+            ),
+            RecipeIngredient(
+                recipe=second, ingredient=ingredients['г'], amount=200,
+            ),
+            RecipeIngredient(
+                recipe=second, ingredient=ingredients['мл'], amount=250,
+            ),
+        ])
+        for recipe in (first, second):
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        response = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(response.data, [
+            {
+                'name': 'Молоко', 'measurement_unit': 'мл', 'amount': 2250,
+                'recipes': [
+                    {'id': first.id, 'name': first.name, 'amount': 2000},
+                    {'id': second.id, 'name': second.name, 'amount': 250},
+                ],
+            },
+            {
+                'name': 'Мука', 'measurement_unit': 'г', 'amount': 1200,
+                'recipes': [
+                    {'id': first.id, 'name': first.name, 'amount': 1000},
+                    {'id': second.id, 'name': second.name, 'amount': 200},
+                ],
+            },
+        ])
+
+    def test_refresh_does_one_pass_per_user(self):
+        recipes = self.recipes + self.create_recipes(4)
+        Cart.objects.bulk_create(
+            Cart(user=self.user, recipe=recipe) for recipe in recipes
+        )
+        shopping_list.rebuild([self.user.id])
+        RecipeIngredient.objects.filter(recipe__in=recipes).update(amount=7)
+        for changed in (recipes[:2], recipes):
+            with self.assertNumQueries(6):
+                shopping_list.refresh_recipes([
+                    recipe.id for recipe in changed
+                ])
+        response = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(
+            [item['amount'] for item in response.data],
+            [7 * len(recipes)] * 3,
+        )
+
+
+class ExportersTest(SimpleTestCase):
+    """Форматы выгрузки выводят все переданные колонки."""
+    columns = (('name', 'name', 'Ингредиент'), ('note', 'note', 'Заметка'))
+    rows = [('Соль', 'по вкусу'), ('Мука', 'просеять')]
+
+    def export(self, exporter):
+        return ''.join(exporter(self.columns).stream(self.rows))
+
+    def test_csv(self):
+        self.assertEqual(
+            self.export(CSVExporter).splitlines(),
+            ['\ufeffИнгредиент,Заметка', 'Соль,по вкусу', 'Мука,просеять'],
+        )
+
+    def test_text(self):
+        self.assertEqual(
+            self.export(TextExporter).splitlines(),
+            ['Ингредиент: Соль, Заметка: по вкусу',
+             'Ингредиент: Мука, Заметка: просеять'],
+        )
+
+    def test_json(self):
+        self.assertEqual(json.loads(self.export(JSONExporter)), [
+            {'name': 'Соль', 'note': 'по вкусу'},
+            {'name': 'Мука', 'note': 'просеять'},
+        ])
+        self.assertEqual(json.loads(
+            ''.join(JSONExporter(self.columns).stream([]))
+        ), [])
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import async_read_urls
 from api.views import (
     CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet,
 )
@@ -11,9 +12,11 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 router.register('users', CustomUserViewSet, basename='users')
 
+ASYNC_READ_URLS = ('recipes-list', 'recipes-detail', 'ingredients-list')
+
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_read_urls(router.urls, ASYNC_READ_URLS))),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -0,0 +1,46 @@
+from rest_framework.exceptions import ValidationError
+
+from api.constans import MIN_VALUE
+from recipes.models import Follow
+
+FOLLOWING_IDS_ATTR = '_following_ids'
+
+
+def get_following_ids(request):
+    """
+    Возвращает множество id авторов, на которых подписан пользователь.
+    Загружается один раз за запрос и хранится на объекте запроса.
+    Сортировка Follow.Meta.ordering сброшена: ради неё запрос
+    соединялся бы с таблицей пользователей.
+    """
+    following_ids = getattr(request, FOLLOWING_IDS_ATTR, None)
+    if following_ids is None:
+        following_ids = set(
+            Follow.objects.filter(
+                user=request.user
+            ).order_by().values_list('author_id', flat=True)
+        )
+        setattr(request, FOLLOWING_IDS_ATTR, following_ids)
+    return following_ids
+
+
+def reset_following_ids(request):
+    """Сбрасывает кеш подписок после их изменения в рамках запроса."""
+    if hasattr(request, FOLLOWING_IDS_ATTR):
+        delattr(request, FOLLOWING_IDS_ATTR)
+
+
+def get_recipes_limit(request):
+    """Проверяет и возвращает параметр recipes_limit из запроса."""
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = None
+    if limit is None or limit < MIN_VALUE:
+        raise ValidationError(
+            {'recipes_limit': 'Должно быть целым числом не меньше 1.'}
+        )
+    return limit
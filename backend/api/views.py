@@ -1,27 +1,43 @@
-import csv
-
-from django.db.models import Sum
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Count, Exists, F, OuterRef, Prefetch, Subquery, Value,
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.response import Response
 
+from recipes import shopping_list
+from recipes.matching import recipe_matcher
 from recipes.models import (
-    Tag, Recipe, Ingredient, Follow, Favorite, Cart, RecipeIngredient,
+    Tag, Recipe, Ingredient, Follow, Favorite, Cart, ShoppingListItem,
 )
 from users.models import User
-from api.filters import IngredientFilter, RecipeFilter
+from api.autocomplete import ingredient_index
+from api.cache import (
+    AnonymousCacheMixin, ReferenceCacheMixin, bump_version,
+)
+from api.exporters import EXPORTERS, SHOPPING_CART_COLUMNS
+from api.feed import FeedPagination
+from api.filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from api.pagination import AuthorPagination, RecipePagination
 from api.permissions import AuthorOrReadOnly
+from api.renderers import CSVRenderer, TextRenderer
 from api.serializers import (
     IngredientSerializer, TagSerializer, RecipeSerializer,
     CustomUserSerializer, SubscriptionSerializer, SubscriptionShowSerializer,
     FavoriteSerializer, RecipeShortSerializer, RecipeCreateSerializer,
-    CartSerializer,
+    CartSerializer, RecipeMatchQuerySerializer, RecipeMatchSerializer,
+    ShoppingListItemSerializer,
 )
+from api.utils import get_recipes_limit, reset_following_ids
 
 
 class CustomUserViewSet(UserViewSet):
@@ -30,6 +46,26 @@ class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     permission_classes = (AuthorOrReadOnly,)
 
+    @staticmethod
+    def get_authors_queryset(limit):
+        """
+        Авторы для страницы подписок: число рецептов считается аннотацией,
+        а первые limit рецептов каждого автора загружаются одним запросом.
+        """
+        recipes = Recipe.objects.all()
+        if limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date').values('pk')[:limit]
+            ))
+        return User.objects.annotate(
+            recipes_count=Count('recipes', distinct=True),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('id')
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -40,11 +76,14 @@ class CustomUserViewSet(UserViewSet):
         """Подписаться и отписываться от автора рецепта."""
         author = get_object_or_404(User, id=id)
         if request.method == 'POST':
+            limit = get_recipes_limit(request)
             serializer = SubscriptionSerializer(
                 data={'user': request.user.id, 'author': author.id}
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            reset_following_ids(request)
+            author = self.get_authors_queryset(limit).get(id=author.id)
             author_serializer = SubscriptionShowSerializer(
                 author, context={'request': request}
             )
@@ -55,6 +94,7 @@ class CustomUserViewSet(UserViewSet):
             Follow, user=request.user, author=author
         )
         subscription.delete()
+        reset_following_ids(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -65,8 +105,10 @@ class CustomUserViewSet(UserViewSet):
     )
     def get_subscriptions(self, request):
         """Список авторов на которых подписан."""
-        authors = User.objects.filter(following__user=request.user)
-        paginator = PageNumberPagination()
+        authors = self.get_authors_queryset(
+            get_recipes_limit(request)
+        ).filter(following__user=request.user)
+        paginator = AuthorPagination()
         result_pages = paginator.paginate_queryset(
             queryset=authors, request=request
         )
@@ -98,8 +140,9 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для работы с обьектами класса Ingredient."""
+    cache_names = ('ingredient',)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -108,22 +151,46 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     search_fields = ('^name', )
 
+    def filter_queryset(self, queryset):
+        """
+        Поиск по префиксу названия идёт по индексу в памяти,
+        если он включен, иначе по функциональному индексу в БД.
+        """
+        name = self.request.query_params.get('name')
+        if (
+            name and self.action == 'list'
+            and settings.INGREDIENT_INDEX_IN_MEMORY
+        ):
+            return ingredient_index.search(name)
+        return super().filter_queryset(queryset)
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для работы с обьектами класса Tag."""
+    cache_names = ('tag',)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, ModelViewSet):
     """Вьюсет для работы с обьектами класса Recipe."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrReadOnly,)
+    pagination_class = RecipePagination
     filterset_class = RecipeFilter
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
+    ordering_fields = ('favorites_count', 'pub_date')
+
+    @staticmethod
+    def change_counter(recipe, field, delta):
+        """Атомарно меняет счётчик рецепта, не опуская его ниже нуля."""
+        recipes = Recipe.objects.filter(pk=recipe.pk)
+        if delta < 0:
+            recipes = recipes.filter(**{f'{field}__gte': -delta})
+        recipes.update(**{field: F(field) + delta})
 
     @action(
         detail=True,
@@ -140,7 +207,10 @@ class RecipeViewSet(ModelViewSet):
                 data={'user': request.user.id, 'recipe': recipe.id}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                self.change_counter(recipe, 'favorites_count', 1)
+            bump_version('favorite')
             favorite_serializer = RecipeShortSerializer(recipe)
             return Response(
                 favorite_serializer.data, status=status.HTTP_201_CREATED
@@ -148,7 +218,10 @@ class RecipeViewSet(ModelViewSet):
         favorite_recipe = get_object_or_404(
             Favorite, user=request.user, recipe=recipe
         )
-        favorite_recipe.delete()
+        with transaction.atomic():
+            favorite_recipe.delete()
+            self.change_counter(recipe, 'favorites_count', -1)
+        bump_version('favorite')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -167,7 +240,10 @@ class RecipeViewSet(ModelViewSet):
                 data={'user': request.user.id, 'recipe': recipe.id}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                self.change_counter(recipe, 'in_carts_count', 1)
+                shopping_list.add_recipe(request.user.id, recipe.id)
             shopping_cart_serializer = RecipeShortSerializer(recipe)
             return Response(
                 shopping_cart_serializer.data, status=status.HTTP_201_CREATED
@@ -175,14 +251,89 @@ class RecipeViewSet(ModelViewSet):
         shopping_cart_recipe = get_object_or_404(
             Cart, user=request.user, recipe=recipe
         )
-        shopping_cart_recipe.delete()
+        with transaction.atomic():
+            shopping_cart_recipe.delete()
+            self.change_counter(recipe, 'in_carts_count', -1)
+            shopping_list.remove_recipe(request.user.id, recipe.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='feed',
+        url_name='feed',
+    )
+    def feed(self, request):
+        """
+        Лента рецептов авторов из подписок от новых к старым
+        с пагинацией по курсору.
+        """
+        recipes = self.get_queryset().filter(
+            author__following__user=request.user
+        )
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='match',
+        url_name='match',
+    )
+    def match(self, request):
+        """
+        Рецепты, которые можно приготовить из переданных ингредиентов
+        (?ingredients=1&ingredients=2), докупив не больше missing.
+        Сортируются по доле имеющихся ингредиентов.
+        """
+        params = RecipeMatchQuerySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'missing': request.query_params.get('missing', 0),
+        })
+        params.is_valid(raise_exception=True)
+        matches = recipe_matcher.match(
+            params.validated_data['ingredients'],
+            params.validated_data['missing'],
+        )
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, available, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.available_count = available
+                recipe.missing_count = total - available
+                results.append(recipe)
+        serializer = RecipeMatchSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     def get_queryset(self):
-        """Переопределяем метод для оптимизации запросов к бд."""
-        recipes = Recipe.objects.prefetch_related(
-            'recipeingredient_set__ingredient', 'tags'
-        ).all()
+        """
+        Переопределяем метод для оптимизации запросов к бд.
+        Теги и ингредиенты подгружает RecipeSerializer только для рецептов,
+        которых нет в кеше.
+        """
+        recipes = Recipe.objects.select_related('author').defer(
+            'search_vector'
+        )
+        user = self.request.user
+        if user.is_authenticated:
+            recipes = recipes.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'),
+                )),
+                is_in_shopping_cart=Exists(Cart.objects.filter(
+                    user=user, recipe=OuterRef('pk'),
+                )),
+            )
         return recipes
 
     def get_serializer_class(self):
@@ -195,36 +346,63 @@ class RecipeViewSet(ModelViewSet):
         """Добаляет данные перед вызовом save."""
         serializer.save(author=self.request.user)
 
-    @staticmethod
-    def ingredients_to_csv(ingredients):
-        """Сохряняем список ингредиентов в выходной файл CSV."""
-        response = HttpResponse(
-            content_type="text/csv",
-            headers={"Content-Disposition": 'attachment; filename="cart.csv"'},
-        )
-        response.write(u'\ufeff'.encode('utf8'))
-        writer = csv.writer(response)
-        writer.writerow(["Ингредиент", "ед.изм.", "количество"])
-        for ingredient in ingredients:
-            writer.writerow(ingredient[key] for key in ingredient)
-        return response
-
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(CSVRenderer, TextRenderer, JSONRenderer),
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
         """
-        Получает ингредиенты из корзины и суммирует количество повторяющтхся.
+        Отдаёт список покупок, который собирается при изменении корзины.
+        Файл отдаётся потоком в формате из параметра format (csv, txt, json).
+        Строки читаются из БД до ответа: под ASGI поток ответа итерируется
+        в цикле событий, где запросы к БД запрещены.
         """
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_recipe__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(ingredient_amount_sum=Sum('amount'))
-
-        return self.ingredients_to_csv(ingredients)
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).order_by(
+            'name', 'measurement_unit'
+        ).values_list(
+            *(field for field, _, _ in SHOPPING_CART_COLUMNS)
+        )
+        rows = list(ingredients)
+        if not rows and shopping_list.build_if_missing(request.user.id):
+            rows = list(ingredients.all())
+        exporter = EXPORTERS[request.accepted_renderer.format]()
+        return StreamingHttpResponse(
+            exporter.stream(rows),
+            content_type=f'{exporter.content_type}; charset=utf-8',
+            headers={
+                'Content-Disposition':
+                    f'attachment; filename="cart.{exporter.format}"'
+            },
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='shopping_list',
+        url_name='shopping_list',
+    )
+    def shopping_list(self, request):
+        """
+        Список покупок с количеством по каждому рецепту из корзины.
+        Единицы измерения приведены к базовым (кг к г, л к мл).
+        """
+        items = list(ShoppingListItem.objects.filter(user=request.user))
+        if not items and shopping_list.build_if_missing(request.user.id):
+            items = list(ShoppingListItem.objects.filter(user=request.user))
+        recipe_ids = {
+            int(recipe_id) for item in items for recipe_id in item.recipes
+        }
+        recipe_names = dict(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('id', 'name'))
+        serializer = ShoppingListItemSerializer(
+            items, many=True, context={'recipe_names': recipe_names}
+        )
+        return Response(serializer.data)
@@ -0,0 +1,40 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с проверкой постоянного соединения CONN_HEALTH_CHECKS,
+    как в Django 4.1: соединение проверяется один раз за HTTP-запрос
+    перед первым обращением к БД. Запросы, которые обходятся без БД
+    (304, ответы из кеша), проверку не делают.
+    """
+    health_check_done = False
+
+    def connect(self):
+        # Новое соединение исправно.
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого HTTP-запроса.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or self.health_check_done
+            or not self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def set_autocommit(self, *args, **kwargs):
+        self.close_if_health_check_failed()
+        return super().set_autocommit(*args, **kwargs)
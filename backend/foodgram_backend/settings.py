@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,16 +65,47 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql с CONN_HEALTH_CHECKS из Django 4.1.
+        'ENGINE': 'foodgram_backend.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Постоянные соединения: сколько секунд держать соединение
+        # открытым между запросами (0 — закрывать после каждого запроса).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Проверка переиспользуемого соединения перед первым
+        # обращением к БД в запросе.
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'true'
+        ).lower() == 'true',
+        # Для pgbouncer в режиме transaction pooling.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 'false'
+        ).lower() == 'true',
     }
 }
 
 
+# Cache
+
+# Версии кеша и блокировки должны быть общими для всех воркеров,
+# поэтому в продакшене нужен Redis. LocMemCache годится только для тестов.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django_redis.cache.RedisCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://redis:6379/1'),
+    }
+}
+
+INGREDIENT_INDEX_IN_MEMORY = os.getenv(
+    'INGREDIENT_INDEX_IN_MEMORY', 'true'
+).lower() == 'true'
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,6 +149,29 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DATA_ROOT = BASE_DIR / 'data'
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Потоки для асинхронных эндпоинтов чтения под ASGI, у каждого
+# потока своё соединение с БД. 0 — эндпоинты не оборачиваются
+# (для WSGI и тестов).
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', 0))
+
+# Бюджеты запроса: количество SQL-запросов и время ответа в секундах.
+# Запросы сверх бюджета пишутся в лог вместе с SQL.
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 20))
+REQUEST_TIME_BUDGET = float(os.getenv('REQUEST_TIME_BUDGET', 0.5))
+
+# Детектор N+1 для staging: запросы, повторившиеся NPLUSONE_THRESHOLD раз
+# с разными параметрами, пишутся в лог, при NPLUSONE_RAISE — ошибка 500.
+# NPLUSONE_IGNORE — места вызова через запятую, например recipes/admin.py.
+NPLUSONE_DETECTOR = os.getenv('NPLUSONE_DETECTOR', 'false').lower() == 'true'
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', 'false').lower() == 'true'
+NPLUSONE_IGNORE = tuple(filter(None, os.getenv('NPLUSONE_IGNORE', '').split(',')))
+
+if NPLUSONE_DETECTOR:
+    MIDDLEWARE.insert(1, 'api.nplusone.NPlusOneMiddleware')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
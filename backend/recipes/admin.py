@@ -4,6 +4,7 @@ from recipes.models import (
     Tag, Recipe, Ingredient, RecipeIngredient, Cart, Follow, Favorite,
 )
 from recipes.constans import MIN_VALUE
+from recipes.changes import recipes_changed
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -22,10 +23,14 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline, )
 
     def count_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     count_favorites.short_description = 'Добавлений в избранное'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipes_changed([form.instance.pk])
+
     def get_tags(self, obj):
         return '\n'.join(obj.tags.values_list('name', flat=True))
 
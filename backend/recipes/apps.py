@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
+        from recipes.indexes import register_index_wrappers
+
+        register_index_wrappers()
@@ -0,0 +1,33 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import publish_changes
+from recipes.models import Recipe
+from recipes.search import refresh_search_vectors
+from recipes.shopping_list import refresh_recipes
+
+
+def recipes_changed(recipe_ids):
+    """
+    Обновляет производные данные рецептов после изменения их названия,
+    описания или ингредиентов: поисковые векторы и списки покупок,
+    а после фиксации транзакции — версию для кешей вместе с id рецептов,
+    по которым воркеры обновляют индексы в памяти. Раньше фиксации
+    версию менять нельзя: другие запросы закешируют под новой версией
+    старые данные.
+    """
+    recipe_ids = list(recipe_ids)
+    touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+    refresh_search_vectors(recipe_ids)
+    refresh_recipes(recipe_ids)
+    transaction.on_commit(partial(publish_changes, 'recipe', recipe_ids))
+
+
+def touch_recipes(recipes):
+    """
+    Обновляет дату изменения рецептов, от которой зависят ключи
+    кеша сериализованных рецептов.
+    """
+    recipes.update(updated_at=timezone.now())
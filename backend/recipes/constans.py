@@ -1,3 +1,16 @@
 MIN_VALUE = 1
 MAX_LENGTH_NAME = 200
 MAX_LENGTH_COLOR = 7
+IMPORT_BATCH_SIZE = 1000
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+RENDITION_WIDTHS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1200,
+}
+SEARCH_CONFIG = 'russian'
+SEARCH_WEIGHTS = {'A': 3, 'B': 2, 'C': 1}
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
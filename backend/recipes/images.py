@@ -0,0 +1,118 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from recipes.constans import RENDITION_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions'
+RENDITION_FORMAT, RENDITION_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+RENDITION_QUALITY = 80
+ORIGINAL_QUALITY = 90
+# Данные изображения, а не метаданные: без прозрачного цвета
+# палитровые PNG и GIF теряют прозрачный фон.
+KEPT_INFO = ('transparency',)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='renditions',
+)
+pending = set()
+pending_lock = Lock()
+
+
+def rendition_name(image_name, rendition):
+    """
+    Имя файла уменьшенной копии изображения.
+    Зависит только от имени оригинала, поэтому URL известен сразу.
+    """
+    stem = PurePosixPath(image_name).stem
+    width = RENDITION_WIDTHS[rendition]
+    return f'{RENDITIONS_DIR}/{stem}_{width}.{RENDITION_EXTENSION}'
+
+
+def strip_metadata(content):
+    """
+    Пересохраняет загруженное изображение без метаданных (EXIF
+    с геолокацией, текстовые блоки PNG), повернув его по тегу
+    ориентации. Сохраняются цветовой профиль и прозрачность. GIF остаётся
+    как есть: пересохранение потеряло бы анимацию.
+    """
+    image = Image.open(BytesIO(content))
+    image_format = image.format
+    if image_format == 'GIF':
+        return content
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.info = {
+        key: image.info[key] for key in KEPT_INFO if key in image.info
+    }
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image_format == 'JPEG':
+        options['quality'] = ORIGINAL_QUALITY
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def make_renditions(image_name):
+    """
+    Создаёт недостающие копии изображения заданной ширины.
+    Копии сохраняются без метаданных оригинала (EXIF и т.п.).
+    """
+    missing = {
+        rendition: rendition_name(image_name, rendition)
+        for rendition in RENDITION_WIDTHS
+        if not default_storage.exists(rendition_name(image_name, rendition))
+    }
+    if not missing:
+        return
+    with default_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        transparent = (
+            'A' in image.getbands() or 'transparency' in image.info
+        )
+        image = image.convert('RGBA' if transparent else 'RGB')
+    if RENDITION_FORMAT == 'JPEG':
+        image = image.convert('RGB')
+    for rendition, name in missing.items():
+        copy = image.copy()
+        copy.thumbnail((RENDITION_WIDTHS[rendition], copy.height))
+        buffer = BytesIO()
+        copy.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def run_make_renditions(image_name):
+    try:
+        make_renditions(image_name)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения %s', image_name)
+    finally:
+        with pending_lock:
+            pending.discard(image_name)
+
+
+def submit_renditions(image_name):
+    with pending_lock:
+        if image_name in pending:
+            return
+        pending.add(image_name)
+    executor.submit(run_make_renditions, image_name)
+
+
+def schedule_renditions(image_name):
+    """Ставит создание копий в фоновый пул после фиксации транзакции."""
+    if image_name:
+        transaction.on_commit(lambda: submit_renditions(image_name))
@@ -0,0 +1,97 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import OpClass as PostgresOpClass
+from django.db.models import Func, Index, OrderBy, UniqueConstraint
+from django.db.models.functions import Collate
+from django.db.models.indexes import IndexExpression
+
+
+class OpClass(Func):
+    """
+    Класс операторов для выражения в индексе PostgreSQL,
+    например text_pattern_ops для поиска по префиксу через LIKE.
+    На других базах выражение индексируется без класса операторов.
+    """
+    template = '%(expressions)s %(name)s'
+
+    def __init__(self, expression, name):
+        super().__init__(expression, name=name)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(self.source_expressions[0])
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def register_index_wrappers():
+    """
+    Регистрирует OpClass обёрткой индексных выражений. Вызывается
+    из RecipesConfig.ready(): ready() django.contrib.postgres
+    перезаписывает список обёрток своим OpClass.
+    """
+    IndexExpression.register_wrappers(
+        OrderBy, OpClass, PostgresOpClass, Collate
+    )
+
+
+class SearchVectorIndex(GinIndex):
+    """
+    GIN-индекс для поискового вектора. На базах кроме PostgreSQL
+    создаётся обычный индекс, чтобы схема применялась и там.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs
+            )
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+
+class CoveringUniqueConstraint(UniqueConstraint):
+    """
+    Ограничение уникальности, индекс которого на PostgreSQL включает
+    ещё и поля covering (INCLUDE), чтобы запрос читал их из индекса.
+    На других базах создаётся обычное ограничение уникальности.
+    """
+
+    def __init__(self, *, covering, **kwargs):
+        super().__init__(**kwargs)
+        self.covering = tuple(covering)
+
+    def get_constraint(self, schema_editor):
+        include = ()
+        if schema_editor.connection.vendor == 'postgresql':
+            include = self.covering
+        return UniqueConstraint(
+            fields=self.fields, name=self.name, condition=self.condition,
+            deferrable=self.deferrable, include=include,
+            opclasses=self.opclasses,
+        )
+
+    def constraint_sql(self, model, schema_editor):
+        return self.get_constraint(schema_editor).constraint_sql(
+            model, schema_editor
+        )
+
+    def create_sql(self, model, schema_editor):
+        return self.get_constraint(schema_editor).create_sql(
+            model, schema_editor
+        )
+
+    def remove_sql(self, model, schema_editor):
+        return self.get_constraint(schema_editor).remove_sql(
+            model, schema_editor
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, CoveringUniqueConstraint):
+            return (
+                super().__eq__(other) and self.covering == other.covering
+            )
+        return super().__eq__(other)
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        kwargs['covering'] = self.covering
+        return path, args, kwargs
@@ -0,0 +1,142 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from recipes.matching import RecipeMatcher
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+RECIPES = 10000
+RECIPE_INGREDIENTS = (3, 12)
+QUERIES = 200
+QUERY_INGREDIENTS = (5, 15)
+MISSING = 2
+SEED = 1
+PERCENTILES = (50, 95)
+
+
+def match_sql(ingredient_ids, max_missing):
+    """Тот же подбор одним запросом с GROUP BY по строкам рецептов."""
+    rows = RecipeIngredient.objects.order_by().values('recipe_id').annotate(
+        total=Count('ingredient_id'),
+        available=Count(
+            'ingredient_id', filter=Q(ingredient_id__in=ingredient_ids),
+        ),
+    ).filter(
+        available__gt=0, total__lte=F('available') + max_missing,
+    ).values_list('recipe_id', 'available', 'total')
+    return sorted(rows, key=lambda result: (
+        -result[1] / result[2], result[2] - result[1], -result[0],
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает подбор рецептов по ингредиентам индексом в памяти '
+        'и запросом к БД, а также полную перестройку индекса с точечным '
+        'обновлением. Недостающие до --recipes рецепты создаются '
+        'в транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=RECIPES)
+        parser.add_argument('--queries', type=int, default=QUERIES)
+        parser.add_argument('--missing', type=int, default=MISSING)
+
+    def handle(self, *args, **kwargs):
+        generator = random.Random(SEED)
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < RECIPE_INGREDIENTS[1]:
+            raise CommandError(
+                'Мало ингредиентов: загрузите их командой '
+                'ingredients_from_data.'
+            )
+        with transaction.atomic():
+            self.seed(generator, kwargs['recipes'], ingredient_ids)
+            queries = [
+                generator.sample(
+                    ingredient_ids, generator.randint(*QUERY_INGREDIENTS),
+                )
+                for _ in range(kwargs['queries'])
+            ]
+            matcher = RecipeMatcher()
+            started = time.perf_counter()
+            state = matcher.get_state()
+            self.report_time('Построение индекса', started)
+            recipe_ids = generator.sample(list(state[1]), 10)
+            started = time.perf_counter()
+            matcher.apply(state, recipe_ids)
+            self.report_time('Обновление 10 рецептов', started)
+            missing = kwargs['missing']
+            from_index = self.measure(
+                'Индекс в памяти', queries,
+                lambda ids: matcher.match(ids, missing),
+            )
+            from_sql = self.measure(
+                'Запрос к БД', queries, lambda ids: match_sql(ids, missing),
+            )
+            if from_index != from_sql:
+                raise CommandError('Результаты подбора различаются.')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def seed(generator, count, ingredient_ids):
+        missing = count - Recipe.objects.count()
+        if missing <= 0:
+            return
+        author = User.objects.create(
+            email='benchmark@foodgram.ru', username='benchmark',
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f'Рецепт {number}', text='Описание',
+                    cooking_time=10, author=author,
+                    image='recipes/benchmark.png',
+                )
+                for number in range(missing)
+            ),
+            batch_size=1000,
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=1,
+                )
+                for recipe_id in Recipe.objects.filter(
+                    author=author,
+                ).values_list('id', flat=True).iterator()
+                for ingredient_id in generator.sample(
+                    ingredient_ids, generator.randint(*RECIPE_INGREDIENTS),
+                )
+            ),
+            batch_size=5000,
+        )
+
+    def report_time(self, title, started):
+        self.stdout.write(
+            f'{title}: {(time.perf_counter() - started) * 1000:.1f} мс.'
+        )
+
+    def measure(self, title, queries, match):
+        timings = []
+        results = []
+        for ids in queries:
+            started = time.perf_counter()
+            results.append(match(ids))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        values = ', '.join(
+            f'p{percentile} '
+            f'{timings[len(timings) * percentile // 100] * 1000:.2f}'
+            for percentile in PERCENTILES
+        )
+        self.stdout.write(
+            f'{title}: всего {sum(timings) * 1000:.0f} мс, {values} мс '
+            'на запрос.'
+        )
+        return results
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Min
+
+from api.cache import bump_version
+from recipes.models import Ingredient, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Объединяет ингредиенты с одинаковыми названием и единицей '
+        'измерения. Запускается перед migrate, создающей ограничение '
+        'unique_ingredient_unit: рецепты переводятся на оставшийся '
+        'ингредиент, количества дублей складываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести количество дублей.',
+        )
+
+    def handle(self, *args, **kwargs):
+        groups = Ingredient.objects.order_by().values(
+            'name', 'measurement_unit',
+        ).annotate(
+            count=Count('id'), survivor_id=Min('id'),
+        ).filter(count__gt=1)
+        duplicates = 0
+        for group in groups:
+            duplicate_ids = list(Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit'],
+            ).exclude(id=group['survivor_id']).values_list('id', flat=True))
+            duplicates += len(duplicate_ids)
+            if not kwargs['dry_run']:
+                self.merge(group['survivor_id'], duplicate_ids)
+        if kwargs['dry_run']:
+            self.stdout.write(f'Найдено дублей: {duplicates}.')
+            return
+        if duplicates:
+            bump_version('ingredient')
+            bump_version('recipe')
+        self.stdout.write(self.style.SUCCESS(
+            f'Объединено дублей ингредиентов: {duplicates}.'
+        ))
+
+    @staticmethod
+    @transaction.atomic
+    def merge(survivor_id, duplicate_ids):
+        """
+        Переносит строки рецептов с дублей на survivor_id и удаляет дубли.
+        Читаются и пишутся только столбцы, которые есть до миграции.
+        """
+        survivor_rows = dict(RecipeIngredient.objects.filter(
+            ingredient_id=survivor_id,
+        ).values_list('recipe_id', 'id'))
+        rows = RecipeIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids,
+        ).order_by('id').values_list('id', 'recipe_id', 'amount')
+        merged = []
+        for row_id, recipe_id, amount in rows:
+            survivor_row_id = survivor_rows.get(recipe_id)
+            if survivor_row_id is None:
+                RecipeIngredient.objects.filter(id=row_id).update(
+                    ingredient_id=survivor_id,
+                )
+                survivor_rows[recipe_id] = row_id
+                continue
+            RecipeIngredient.objects.filter(id=survivor_row_id).update(
+                amount=F('amount') + amount,
+            )
+            merged.append(row_id)
+        RecipeIngredient.objects.filter(id__in=merged).delete()
+        # Без сигналов: их обработчики обновляют поля рецептов,
+        # которых в базе ещё нет до migrate.
+        Ingredient.objects.filter(id__in=duplicate_ids)._raw_delete(
+            Ingredient.objects.db
+        )
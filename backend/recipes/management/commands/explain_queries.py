@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import CustomUserViewSet, IngredientViewSet, RecipeViewSet
+from recipes.models import Tag
+from users.models import User
+
+# Горячие запросы: (viewset, действие, параметры строки запроса).
+HOT_REQUESTS = (
+    (RecipeViewSet, 'list', {}),
+    (RecipeViewSet, 'list', {'ordering': '-favorites_count'}),
+    (RecipeViewSet, 'list', {'tags': '{tag}'}),
+    (RecipeViewSet, 'list', {'author': '{author}'}),
+    (RecipeViewSet, 'list', {'is_favorited': 1}),
+    (RecipeViewSet, 'list', {'is_in_shopping_cart': 1}),
+    (RecipeViewSet, 'list', {'search': 'суп'}),
+    (RecipeViewSet, 'shopping_list', {}),
+    (IngredientViewSet, 'list', {'name': 'сол'}),
+    (CustomUserViewSet, 'get_subscriptions', {}),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет горячие запросы API от имени пользователя и выводит '
+        'план каждого SELECT. Рецепты, уже лежащие в кеше фрагментов, '
+        'запросов к БД не делают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, по умолчанию первый суперпользователь.',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='EXPLAIN ANALYZE: выполнить запросы и показать время.',
+        )
+
+    # Запросы APIRequestFactory приходят с хостом testserver.
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **kwargs):
+        user = self.get_user(kwargs['user'])
+        tag = Tag.objects.values_list('slug', flat=True).first() or ''
+        factory = APIRequestFactory()
+        for viewset, action, params in HOT_REQUESTS:
+            params = {
+                name: str(value).format(tag=tag, author=user.id)
+                for name, value in params.items()
+            }
+            request = factory.get('/', params)
+            force_authenticate(request, user)
+            view = viewset.as_view({'get': action})
+            with CaptureQueriesContext(connection) as queries:
+                view(request).render()
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{viewset.__name__}.{action} {params}: '
+                f'{len(queries)} запросов'
+            ))
+            for query in queries:
+                if query['sql'].lstrip().upper().startswith('SELECT'):
+                    self.explain(query['sql'], kwargs['analyze'])
+
+    @staticmethod
+    def get_user(email):
+        users = User.objects.order_by('-is_superuser', 'id')
+        if email:
+            users = users.filter(email=email)
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        return user
+
+    def explain(self, sql, analyze):
+        prefix = connection.ops.explain_query_prefix(
+            **({'analyze': True} if analyze else {})
+        )
+        self.stdout.write(sql)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            for row in cursor.fetchall():
+                self.stdout.write('    ' + ' '.join(map(str, row)))
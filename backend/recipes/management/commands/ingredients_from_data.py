@@ -1,14 +1,77 @@
 import csv
-import sys
+import json
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.cache import bump_version
 from foodgram_backend.settings import DATA_ROOT
+from recipes.constans import IMPORT_BATCH_SIZE, MAX_LENGTH_NAME
 from recipes.models import Ingredient
 
+CSV_HEADER = ['name', 'measurement_unit']
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Построчно читает пары (название, единица измерения) из csv."""
+    for row in csv.reader(file):
+        if row == CSV_HEADER:
+            continue
+        yield row
+
+
+def read_json(file):
+    """
+    Потоково читает массив объектов из json,
+    не загружая весь файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('Ожидается массив объектов в json.')
+                buffer = buffer[1:]
+                started = True
+                continue
+            buffer = buffer.lstrip(',').lstrip()
+            if not buffer or buffer[0] == ']':
+                break
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Файл json обрезан или повреждён.')
+                break
+            buffer = buffer[end:]
+            if isinstance(item, dict):
+                yield [item.get('name'), item.get('measurement_unit')]
+            else:
+                yield item
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из csv файла в базу данных.'
+    help = (
+        'Загрузка ингредиентов из csv или json файла в базу данных. '
+        'Повторный запуск не создаёт дубликатов.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -16,25 +79,91 @@ class Command(BaseCommand):
             type=str,
             help='Указывает путь к файлу с фикстурами.',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество строк, записываемых за один запрос.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Проверить файл и посчитать изменения без записи в базу.',
+        )
+
+    @staticmethod
+    def clean_row(row):
+        """Возвращает (название, единица) или None для неверной строки."""
+        if not isinstance(row, (list, tuple)) or len(row) != 2:
+            return None
+        name, measurement_unit = row
+        if not isinstance(name, str) or not isinstance(measurement_unit, str):
+            return None
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if (
+            not name or not measurement_unit
+            or len(name) > MAX_LENGTH_NAME
+            or len(measurement_unit) > MAX_LENGTH_NAME
+        ):
+            return None
+        return name, measurement_unit
+
+    def import_batch(self, rows, dry_run):
+        """Записывает новые ингредиенты пачки, возвращает счётчики."""
+        keys = set()
+        skipped = 0
+        for row in rows:
+            key = self.clean_row(row)
+            if key is None:
+                skipped += 1
+            else:
+                keys.add(key)
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).values_list('name', 'measurement_unit'))
+        new = keys - existing
+        if new and not dry_run:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in new
+                ],
+                ignore_conflicts=True,
+            )
+        return len(new), len(rows) - skipped - len(new), skipped
 
     def handle(self, *args, **kwargs):
         path_file = kwargs['path_file']
+        batch_size = kwargs['batch_size']
+        dry_run = kwargs['dry_run']
+        reader = READERS.get(path_file.rsplit('.', 1)[-1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы csv и json.')
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть больше 0.')
+        started = time.monotonic()
+        inserted = existing = skipped = 0
         try:
             with open(
                 f'{DATA_ROOT}/{path_file}',
                 encoding='utf-8',
             ) as file:
-                reader = csv.reader(file)
-                next(reader)
-                ingredients = [
-                    Ingredient(
-                        name=extracted_name,
-                        measurement_unit=extracted_unit,
-                    )
-                    for extracted_name, extracted_unit in reader
-                ]
-                Ingredient.objects.bulk_create(ingredients)
-        except ValueError:
-            sys.stdout.write("Ошибка! Неверный тип данных!")
-        else:
-            sys.stdout.write("Данные загружены!")
+                rows = reader(file)
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    counts = self.import_batch(batch, dry_run)
+                    inserted += counts[0]
+                    existing += counts[1]
+                    skipped += counts[2]
+        except (OSError, UnicodeDecodeError, csv.Error) as error:
+            raise CommandError(f'Ошибка чтения файла: {error}')
+        if inserted and not dry_run:
+            bump_version('ingredient')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Проверка завершена" if dry_run else "Данные загружены"}! '
+            f'Добавлено: {inserted}, без изменений: {existing}, '
+            f'пропущено неверных строк: {skipped}. '
+            f'Время: {time.monotonic() - started:.2f} с.'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии изображений рецептов.'
+
+    def handle(self, *args, **kwargs):
+        images = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        for image_name in images.iterator():
+            try:
+                make_renditions(image_name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{image_name}: {error}')
+        self.stdout.write(self.style.SUCCESS('Копии изображений созданы!'))
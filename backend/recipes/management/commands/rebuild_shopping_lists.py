@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Cart, ShoppingListItem
+from recipes.shopping_list import rebuild
+
+USERS_CHUNK = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает списки покупок заново по корзинам пользователей, '
+        'исправляя расхождения с таблицей Cart.'
+    )
+
+    def handle(self, *args, **kwargs):
+        user_ids = sorted(
+            set(Cart.objects.values_list('user_id', flat=True))
+            | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+        )
+        for start in range(0, len(user_ids), USERS_CHUNK):
+            rebuild(user_ids[start:start + USERS_CHUNK])
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны для {len(user_ids)} пользователей.'
+        ))
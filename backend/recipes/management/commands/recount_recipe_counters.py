@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Cart, Favorite, Recipe
+
+
+def count_for_recipe(model):
+    """Подзапрос с количеством строк model для каждого рецепта."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного и списков покупок у рецептов, '
+        'исправляя расхождения с таблицами Favorite и Cart.'
+    )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            updated = Recipe.objects.update(
+                favorites_count=count_for_recipe(Favorite),
+                in_carts_count=count_for_recipe(Cart),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны для {updated} рецептов.'
+        ))
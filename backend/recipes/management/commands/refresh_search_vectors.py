@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from recipes.models import Recipe
+from recipes.search import is_postgresql, refresh_search_vectors
+
+RECIPES_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет поисковые векторы рецептов пачками. Нужна после '
+        'добавления поля search_vector, когда у существующих рецептов '
+        'векторов ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Только рецепты без поискового вектора.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECIPES_CHUNK,
+            help='Сколько рецептов обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **kwargs):
+        if not is_postgresql():
+            self.stdout.write(
+                'Поисковые векторы используются только с PostgreSQL.'
+            )
+            return
+        recipes = Recipe.objects.order_by('id')
+        if kwargs['only_missing']:
+            recipes = recipes.filter(search_vector__isnull=True)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        chunk_size = kwargs['chunk_size']
+        for start in range(0, len(recipe_ids), chunk_size):
+            refresh_search_vectors(recipe_ids[start:start + chunk_size])
+        if recipe_ids:
+            bump_version('recipe')
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы обновлены для {len(recipe_ids)} рецептов.'
+        ))
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from api.indexes import VersionedIndex
+from recipes.models import RecipeIngredient
+
+
+class RecipeMatcher(VersionedIndex):
+    """
+    Подбор рецептов по имеющимся ингредиентам.
+    В памяти процесса хранятся списки рецептов для каждого ингредиента
+    и состав каждого рецепта, поэтому подбор не требует GROUP BY по всем
+    рецептам: просматриваются только рецепты с имеющимися ингредиентами.
+    """
+    name = 'recipe'
+
+    @staticmethod
+    def load(recipe_ids=None):
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in rows.iterator():
+            recipes[recipe_id].add(ingredient_id)
+        return recipes
+
+    def build(self):
+        recipes = self.load()
+        postings = defaultdict(set)
+        for recipe_id, ingredient_ids in recipes.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].add(recipe_id)
+        return dict(postings), dict(recipes)
+
+    def apply(self, state, ids):
+        postings, recipes = state[0].copy(), state[1].copy()
+        fresh = self.load(ids)
+        for recipe_id in ids:
+            old = recipes.pop(recipe_id, set())
+            new = fresh.get(recipe_id, set())
+            for ingredient_id in old - new:
+                postings[ingredient_id] = postings[ingredient_id] - {recipe_id}
+                if not postings[ingredient_id]:
+                    del postings[ingredient_id]
+            for ingredient_id in new - old:
+                postings[ingredient_id] = (
+                    postings.get(ingredient_id, set()) | {recipe_id}
+                )
+            if new:
+                recipes[recipe_id] = new
+        return postings, recipes
+
+    def match(self, ingredient_ids, max_missing=0):
+        """
+        Рецепты, которым не хватает не больше max_missing ингредиентов.
+        Возвращает кортежи (id рецепта, есть, всего) по убыванию доли
+        имеющихся ингредиентов.
+        """
+        postings, recipes = self.get_state()
+        matched = defaultdict(int)
+        for ingredient_id in set(ingredient_ids):
+            for recipe_id in postings.get(ingredient_id, ()):
+                matched[recipe_id] += 1
+        results = []
+        for recipe_id, count in matched.items():
+            total = len(recipes.get(recipe_id, ()))
+            if count <= total <= count + max_missing:
+                results.append((recipe_id, count, total))
+        results.sort(key=lambda result: (
+            -result[1] / result[2], result[2] - result[1], -result[0],
+        ))
+        return results
+
+
+recipe_matcher = RecipeMatcher()
@@ -1,8 +1,13 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Upper
 
 from recipes.constans import MAX_LENGTH_NAME, MAX_LENGTH_COLOR, MIN_VALUE
+from recipes.indexes import (
+    CoveringUniqueConstraint, OpClass, SearchVectorIndex,
+)
 
 User = get_user_model()
 
@@ -55,15 +60,64 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx',
+            ),
+            SearchVectorIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+        ]
+
+    # Поля, которые меняются только запросами UPDATE: счётчики
+    # и поисковый вектор. save() существующего рецепта их не пишет,
+    # чтобы не затереть значения, изменённые другими запросами.
+    UPDATED_SEPARATELY = ('favorites_count', 'in_carts_count', 'search_vector')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.UPDATED_SEPARATELY
+            ]
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Ингредиент."""
@@ -73,6 +127,18 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(
+                OpClass(Upper('name'), name='text_pattern_ops'),
+                name='ingredient_name_upper_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -96,8 +162,10 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
         constraints = [
-            models.UniqueConstraint(
+            # Сериализатор рецептов читает amount из индекса.
+            CoveringUniqueConstraint(
                 fields=['recipe', 'ingredient'],
+                covering=['amount'],
                 name='unique_ingredient',
             ),
         ]
@@ -194,3 +262,43 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил в избраное {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Строка списка покупок пользователя. Поддерживается при добавлении
+    и удалении рецептов из корзины, единицы измерения приведены к базовым.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    name = models.CharField(
+        verbose_name='Ингредиент',
+        max_length=MAX_LENGTH_NAME,
+    )
+    measurement_unit = models.CharField(
+        verbose_name='Единица измерения',
+        max_length=MAX_LENGTH_NAME,
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+    recipes = models.JSONField(
+        verbose_name='Количество по рецептам',
+        default=dict,
+    )
+
+    class Meta:
+        verbose_name = 'Продукт в списке покупок'
+        verbose_name_plural = 'Продукты в списках покупок'
+        ordering = ['name', 'measurement_unit']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name', 'measurement_unit'],
+                name='unique_shopping_list_item',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.measurement_unit}): {self.amount}'
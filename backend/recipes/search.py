@@ -0,0 +1,163 @@
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection
+from django.db.models import (
+    Case, F, IntegerField, OuterRef, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from api.indexes import VersionedIndex
+from recipes.constans import SEARCH_CONFIG, SEARCH_WEIGHTS
+from recipes.models import Recipe, RecipeIngredient
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector():
+    """Поисковый вектор рецепта: название, ингредиенты и описание."""
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('')),
+            weight='B', config=SEARCH_CONFIG,
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vectors(recipe_ids):
+    """
+    Пересчитывает поисковые векторы рецептов после изменения названия,
+    описания или ингредиентов.
+    """
+    if is_postgresql():
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=search_vector()
+        )
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+class RecipeSearchIndex(VersionedIndex):
+    """
+    Инвертированный индекс рецептов в памяти процесса для баз без
+    полнотекстового поиска. Хранит веса слов каждого рецепта и списки
+    рецептов по словам.
+    """
+    name = 'recipe'
+
+    @staticmethod
+    def load(recipe_ids=None):
+        """{id рецепта: {слово: вес}} по названию, ингредиентам, описанию."""
+        recipes = Recipe.objects.all()
+        ingredients = RecipeIngredient.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        documents = defaultdict(lambda: defaultdict(int))
+        rows = (
+            (id, SEARCH_WEIGHTS[weight], text)
+            for weight, values in (
+                ('A', recipes.values_list('id', 'name')),
+                ('B', ingredients.values_list(
+                    'recipe_id', 'ingredient__name'
+                )),
+                ('C', recipes.values_list('id', 'text')),
+            )
+            for id, text in values.iterator()
+        )
+        for id, weight, text in rows:
+            for token in tokenize(text):
+                documents[id][token] += weight
+        return documents
+
+    def build(self):
+        documents = self.load()
+        postings = defaultdict(dict)
+        for id, scores in documents.items():
+            for token, score in scores.items():
+                postings[token][id] = score
+        return dict(postings), dict(documents)
+
+    def apply(self, state, ids):
+        postings, documents = state[0].copy(), state[1].copy()
+        fresh = self.load(ids)
+        copied = set()
+
+        def posting(token):
+            # Списки слов копируются один раз: старое состояние
+            # читают другие потоки.
+            if token not in copied:
+                postings[token] = dict(postings.get(token, {}))
+                copied.add(token)
+            return postings[token]
+
+        for id in ids:
+            for token in documents.pop(id, {}):
+                posting(token).pop(id, None)
+            if id in fresh:
+                documents[id] = fresh[id]
+                for token, score in fresh[id].items():
+                    posting(token)[id] = score
+        for token in copied:
+            if not postings[token]:
+                del postings[token]
+        return postings, documents
+
+    def search(self, query):
+        """id рецептов, содержащих все слова запроса, по убыванию веса."""
+        postings, _ = self.get_state()
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        matches = [postings.get(token, {}) for token in tokens]
+        ids = set.intersection(*(set(scores) for scores in matches))
+        return sorted(
+            ids,
+            key=lambda id: (-sum(scores[id] for scores in matches), -id),
+        )
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """
+    Фильтрует и сортирует рецепты по релевантности запросу:
+    в PostgreSQL по полю search_vector, иначе по индексу в памяти.
+    """
+    if is_postgresql():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date')
+    ids = recipe_search_index.search(query)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(
+            When(pk=id, then=Value(position))
+            for position, id in enumerate(ids)
+        ),
+        output_field=IntegerField(),
+    ))
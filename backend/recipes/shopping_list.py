@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from recipes.constans import UNIT_CONVERSIONS
+from recipes.models import Cart, RecipeIngredient, ShoppingListItem
+
+
+def normalize(name, measurement_unit, amount):
+    """Приводит количество к базовой единице измерения."""
+    measurement_unit, factor = UNIT_CONVERSIONS.get(
+        measurement_unit, (measurement_unit, 1)
+    )
+    return name, measurement_unit, amount * factor
+
+
+def get_contributions(recipe_ids):
+    """{id рецепта: {(название, единица): количество}} в базовых единицах."""
+    contributions = defaultdict(lambda: defaultdict(int))
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+        'amount',
+    )
+    for recipe_id, *ingredient in rows:
+        name, measurement_unit, amount = normalize(*ingredient)
+        contributions[recipe_id][name, measurement_unit] += amount
+    return contributions
+
+
+def replace_recipes(user_id, contributions):
+    """
+    Заменяет вклады рецептов в списке покупок пользователя одним
+    проходом: contributions — {id рецепта: вклад}, пустой вклад убирает
+    рецепт. Вызывается внутри транзакции вместе с изменением корзины.
+    """
+    keys = {
+        str(recipe_id): contribution
+        for recipe_id, contribution in contributions.items()
+    }
+    items = {
+        (item.name, item.measurement_unit): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id=user_id
+        )
+    }
+    changed = {}
+    for item_key, item in items.items():
+        for key in keys.keys() & item.recipes.keys():
+            item.amount -= item.recipes.pop(key)
+            changed[item_key] = item
+    for key, contribution in keys.items():
+        for item_key, amount in contribution.items():
+            item = items.get(item_key)
+            if item is None:
+                name, measurement_unit = item_key
+                item = items[item_key] = ShoppingListItem(
+                    user_id=user_id, name=name,
+                    measurement_unit=measurement_unit,
+                    amount=0, recipes={},
+                )
+            item.amount += amount
+            item.recipes[key] = amount
+            changed[item_key] = item
+    ShoppingListItem.objects.bulk_update(
+        [item for item in changed.values() if item.pk and item.recipes],
+        ['amount', 'recipes'],
+    )
+    ShoppingListItem.objects.bulk_create(
+        item for item in changed.values() if not item.pk
+    )
+    deleted = [
+        item.pk for item in changed.values()
+        if item.pk and not item.recipes
+    ]
+    if deleted:
+        ShoppingListItem.objects.filter(pk__in=deleted).delete()
+
+
+def add_recipe(user_id, recipe_id, contribution=None):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    if contribution is None:
+        contribution = get_contributions([recipe_id])[recipe_id]
+    replace_recipes(user_id, {recipe_id: contribution})
+
+
+def remove_recipe(user_id, recipe_id):
+    """Убирает вклад рецепта из списка покупок пользователя."""
+    replace_recipes(user_id, {recipe_id: {}})
+
+
+def group_by_user(carts):
+    """{id пользователя: [id рецептов]} по строкам корзины."""
+    recipes = defaultdict(list)
+    for user_id, recipe_id in carts:
+        recipes[user_id].append(recipe_id)
+    return recipes
+
+
+@transaction.atomic
+def refresh_recipes(recipe_ids):
+    """
+    Пересчитывает списки покупок, в корзинах которых есть рецепты:
+    по одному проходу на пользователя для всех его изменённых рецептов.
+    """
+    contributions = get_contributions(recipe_ids)
+    carts = Cart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', 'recipe_id')
+    for user_id, user_recipe_ids in group_by_user(carts).items():
+        replace_recipes(user_id, {
+            recipe_id: contributions[recipe_id]
+            for recipe_id in user_recipe_ids
+        })
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Собирает списки покупок пользователей заново по их корзинам."""
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    carts = list(Cart.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'recipe_id'))
+    contributions = get_contributions({recipe_id for _, recipe_id in carts})
+    for user_id, user_recipe_ids in group_by_user(carts).items():
+        replace_recipes(user_id, {
+            recipe_id: contributions[recipe_id]
+            for recipe_id in user_recipe_ids
+        })
+
+
+def build_if_missing(user_id):
+    """
+    Собирает список покупок, если он пуст, а корзина нет: корзина
+    заполнена до появления таблицы списков. Возвращает True, если
+    список собран.
+    """
+    if not Cart.objects.filter(user_id=user_id).exists():
+        return False
+    try:
+        rebuild([user_id])
+    except IntegrityError:
+        # Список одновременно собрал другой запрос.
+        pass
+    return True